@@ -1,7 +1,11 @@
 import itertools
+import math
 import random
 from random import choice
-from copy import deepcopy
+
+# Maximum number of search steps spent enumerating the mine
+# configurations of a single frontier component when guessing
+GUESS_NODE_LIMIT = 100000
 
 
 class Minesweeper:
@@ -9,31 +13,58 @@ class Minesweeper:
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, safe=()):
 
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
+
+        # The board is a flat array with cell (i, j) at index i * width + j
+        self.board = bytearray(height * width)
+
+        # Add mines randomly, sampling without replacement among the cells
+        # that are not required to be safe (such as the first cell clicked)
+        excluded = set(i * width + j for i, j in safe)
+        candidates = [index for index in range(height * width) if index not in excluded]
         self.mines = set()
+        for index in random.sample(candidates, mines):
+            self.board[index] = 1
+            self.mines.add(divmod(index, width))
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
-
-        # At first, player has found no mines
+        # Number of mines next to each cell, computed once
+        self.counts = self.count_nearby_mines()
+
+        # At first, player has found no mines and revealed no cells
         self.mines_found = set()
+        self.revealed = set()
+
+    def count_nearby_mines(self):
+        """
+        Returns a flat array holding, for every cell, the number of mines
+        within one row and column of it, not including the cell itself.
+        The 3x3 sums are computed as a sum over each row's neighbors
+        followed by a sum over each column's neighbors.
+        """
+        width = self.width
+        rows = [list(self.board[i * width:(i + 1) * width]) for i in range(self.height)]
+
+        # Sum each cell with its left and right neighbors
+        horizontal = [
+            [left + center + right for left, center, right in zip([0] + row[:-1], row, row[1:] + [0])]
+            for row in rows
+        ]
+
+        # Sum those with the rows above and below, then remove the cell itself
+        empty = [0] * width
+        counts = bytearray()
+        for i, row in enumerate(horizontal):
+            above = horizontal[i - 1] if i > 0 else empty
+            below = horizontal[i + 1] if i < self.height - 1 else empty
+            counts.extend(
+                up + center + down - mine
+                for up, center, down, mine in zip(above, row, below, rows[i])
+            )
+        return counts
 
     def print(self):
         """
@@ -43,7 +74,7 @@ class Minesweeper:
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[i * self.width + j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -52,7 +83,7 @@ class Minesweeper:
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -60,24 +91,35 @@ class Minesweeper:
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return self.counts[i * self.width + j]
 
-        # Keep count of nearby mines
-        count = 0
+    def reveal(self, cell):
+        """
+        Reveals a cell that is not a mine. If it has no nearby mines,
+        all of its neighbors are revealed too, and so on, opening the whole
+        connected region of such cells together with its border.
 
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+        Returns a list of `(cell, count)` pairs for the newly revealed cells,
+        where `count` is the number of nearby mines.
+        """
+        if cell in self.revealed:
+            return []
 
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+        self.revealed.add(cell)
+        revealed = [(cell, self.nearby_mines(cell))]
+        for (i, j), count in revealed:
+            if count:
+                continue
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+            # Neighbors of a cell without nearby mines are safe
+            for k in range(i - 1, i + 2):
+                for l in range(j - 1, j + 2):
+                    if 0 <= k < self.height and 0 <= l < self.width and (k, l) not in self.revealed:
+                        self.revealed.add((k, l))
+                        revealed.append(((k, l), self.nearby_mines((k, l))))
 
-        return count
+        return revealed
 
     def won(self):
         """
@@ -91,17 +133,27 @@ class Sentence:
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    Sentences are hashable so that a knowledge base can hold them in a set,
+    so they are never changed in place: `without_mine` and `without_safe`
+    return reduced sentences instead.
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = frozenset(cells)
         self.count = count
 
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash((self.cells, self.count))
+
+    def __len__(self):
+        return len(self.cells)
+
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{set(self.cells)} = {self.count}"
 
     def known_mines(self, known_safes):
         """
@@ -112,10 +164,10 @@ class Sentence:
         # This is the case if the Sentence counter is equal to the
         # number of Sentence cells not known to be safe.
 
-        safes_in_sentence = known_safes.intersection(self.cells)
+        safes_in_sentence = self.cells.intersection(known_safes)
 
         if self.count == len(self.cells) - len(safes_in_sentence):
-            return self.cells.difference(safes_in_sentence)
+            return set(self.cells.difference(safes_in_sentence))
         return set()
 
     def known_safes(self, known_mines):
@@ -127,28 +179,334 @@ class Sentence:
         # This is the case if the Sentence's mine counter is equal to the
         # number of Sentence cells that are in the set of known mines.
 
-        mines_in_sentence = known_mines.intersection(self.cells)
+        mines_in_sentence = self.cells.intersection(known_mines)
 
         if self.count == len(mines_in_sentence):
-            return self.cells.difference(mines_in_sentence)
+            return set(self.cells.difference(mines_in_sentence))
         return set()
 
-    def mark_mine(self, cell):
+    def issubset(self, other):
         """
-        Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        Returns True if every cell of this sentence also belongs to `other`.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
-            self.count -= 1
+        return self.cells <= other.cells
 
-    def mark_safe(self, cell):
+    def difference(self, other):
+        """
+        Returns the sentence `self - other`, assuming `other` is a subset of `self`.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
+    def without_mine(self, cell):
+        """
+        Returns a new sentence with `cell` removed, given the fact that
+        the cell is known to be a mine.
+        """
+        return Sentence(self.cells.difference((cell,)), self.count - 1)
+
+    def without_safe(self, cell):
+        """
+        Returns a new sentence with `cell` removed, given the fact that
+        the cell is known to be safe.
+        """
+        return Sentence(self.cells.difference((cell,)), self.count)
+
+
+class BitSentence:
+    """
+    Logical statement about a Minesweeper game, like `Sentence`,
+    but with the cells stored as an integer bitmask over the board.
+    Cell (i, j) corresponds to bit i * width + j, so subset tests and
+    differences between sentences are plain bit operations.
+
+    Known cells are passed to `known_mines` and `known_safes` as bitmasks
+    too, and cells are only decoded from the mask when they are returned.
+    """
+
+    def __init__(self, mask, count, width, bits=None):
+        self.mask = mask
+        self.count = count
+        self.width = width
+
+        # Bit positions of the cells, which index the sentence in the AI
+        self.bits = self.positions(mask) if bits is None else bits
+
+        # Sentences are hashed often, and hashing a large mask is not free
+        self.hash_value = hash((mask, count))
+
+    @classmethod
+    def from_cells(cls, cells, count, width):
+        """
+        Creates a sentence from an iterable of (i, j) cells.
+        """
+        bits = []
+        mask = 0
+        for i, j in cells:
+            position = i * width + j
+            bits.append(position)
+            mask |= 1 << position
+
+        # Repeated cells are only counted once
+        if mask.bit_count() != len(bits):
+            return cls(mask, count, width)
+        return cls(mask, count, width, tuple(bits))
+
+    @property
+    def cells(self):
+        """
+        Returns the set of (i, j) cells in the sentence.
+        """
+        return frozenset(self.decode(self.mask))
+
+    def __eq__(self, other):
+        return self.mask == other.mask and self.count == other.count
+
+    def __hash__(self):
+        return self.hash_value
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __str__(self):
+        return f"{set(self.cells)} = {self.count}"
+
+    @staticmethod
+    def positions(mask):
+        """
+        Returns the tuple of bit positions set in `mask`.
+        """
+        positions = []
+        while mask:
+            position = mask.bit_length() - 1
+            positions.append(position)
+            mask ^= 1 << position
+        return tuple(positions)
+
+    def decode(self, mask):
+        """
+        Returns the set of (i, j) cells whose bits are set in `mask`.
+        """
+        cells = set()
+        while mask:
+            position = mask.bit_length() - 1
+            cells.add(divmod(position, self.width))
+            mask ^= 1 << position
+        return cells
+
+    def known_mines(self, known_safes):
+        """
+        Returns the set of all cells in the sentence known to be mines,
+        given the bitmask of cells known to be safe.
+        """
+        unknown = self.mask & ~known_safes
+
+        if unknown and self.count == unknown.bit_count():
+            return self.decode(unknown)
+        return set()
+
+    def known_safes(self, known_mines):
+        """
+        Returns the set of all cells in the sentence known to be safe,
+        given the bitmask of cells known to be mines.
+        """
+        mines_in_sentence = self.mask & known_mines
+
+        if self.count == mines_in_sentence.bit_count() and self.mask != mines_in_sentence:
+            return self.decode(self.mask & ~mines_in_sentence)
+        return set()
+
+    def issubset(self, other):
+        """
+        Returns True if every cell of this sentence also belongs to `other`.
+        """
+        return self.mask & ~other.mask == 0
+
+    def difference(self, other):
+        """
+        Returns the sentence `self - other`, assuming `other` is a subset of `self`.
+        """
+        return BitSentence(self.mask & ~other.mask, self.count - other.count, self.width)
+
+    def without_mine(self, cell):
+        """
+        Returns a new sentence with `cell` removed, given the fact that
+        the cell is known to be a mine.
+        """
+        position = cell[0] * self.width + cell[1]
+        index = self.bits.index(position)
+        return BitSentence(self.mask ^ (1 << position), self.count - 1, self.width,
+                           self.bits[:index] + self.bits[index + 1:])
+
+    def without_safe(self, cell):
         """
-        Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        Returns a new sentence with `cell` removed, given the fact that
+        the cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        position = cell[0] * self.width + cell[1]
+        index = self.bits.index(position)
+        return BitSentence(self.mask ^ (1 << position), self.count, self.width,
+                           self.bits[:index] + self.bits[index + 1:])
+
+
+class LinearSystem:
+    """
+    Knowledge about a Minesweeper game as a system of linear equations
+    over cells that are either mines (1) or safe (0). Each sentence
+    `{A, B, C} = 2` becomes the equation A + B + C = 2.
+
+    The equations are kept in reduced row echelon form with integer
+    coefficients, and updated incrementally as equations are added
+    and as cells become known.
+    """
+
+    def __init__(self):
+
+        # Rows keyed by their pivot cell; each row is a pair of a
+        # dictionary mapping cells to nonzero coefficients, and a constant.
+        # A pivot cell appears in no row other than its own.
+        self.rows = dict()
+
+        # Map from each cell to the pivots of the rows it appears in
+        self.columns = dict()
+
+        # Pivots of rows changed since the last call to deduce
+        self.changed = set()
+
+    def add_equation(self, cells, count):
+        """
+        Adds the equation stating that `count` of `cells` are mines.
+        """
+        self.add_row({cell: 1 for cell in cells}, count)
+
+    def add_row(self, coefficients, constant):
+        """
+        Reduces a row by the existing rows and adds it to the system,
+        eliminating its new pivot from all other rows.
+        """
+        for pivot in [cell for cell in coefficients if cell in self.rows]:
+            coefficients, constant = self.eliminate(
+                (coefficients, constant), self.rows[pivot], pivot
+            )
+
+        # The row is implied by the system
+        if not coefficients:
+            return
+
+        pivot = min(coefficients)
+        row = self.normalize(coefficients, constant, pivot)
+        for other in tuple(self.columns.get(pivot, ())):
+            self.set_row(other, self.normalize(
+                *self.eliminate(self.rows[other], row, pivot), other
+            ))
+        self.set_row(pivot, row)
+
+    def assign(self, cell, value):
+        """
+        Substitutes the known value of `cell` into the system.
+        """
+        if cell in self.rows:
+            # A pivot appears in its own row only; the rest of that row
+            # becomes a new equation over non-pivot cells
+            coefficients, constant = self.remove_row(cell)
+            constant -= coefficients.pop(cell) * value
+            self.add_row(coefficients, constant)
+            return
+
+        for pivot in tuple(self.columns.get(cell, ())):
+            coefficients, constant = self.rows[pivot]
+            coefficients = dict(coefficients)
+            constant -= coefficients.pop(cell) * value
+            self.set_row(pivot, self.normalize(coefficients, constant, pivot))
+
+    def deduce(self):
+        """
+        Returns the sets of cells that some changed row forces to be
+        mines and to be safe, respectively.
+
+        A cell is forced if giving it the other value puts the row's
+        constant out of reach of the row's remaining cells.
+        """
+        mines = set()
+        safes = set()
+        for pivot in self.changed:
+            if pivot not in self.rows:
+                continue
+
+            coefficients, constant = self.rows[pivot]
+            lowest = sum(value for value in coefficients.values() if value < 0)
+            highest = sum(value for value in coefficients.values() if value > 0)
+            for cell, value in coefficients.items():
+                if value > 0:
+                    if lowest + value > constant:
+                        safes.add(cell)
+                    elif highest - value < constant:
+                        mines.add(cell)
+                else:
+                    if highest + value < constant:
+                        safes.add(cell)
+                    elif lowest - value > constant:
+                        mines.add(cell)
+
+        self.changed = set()
+        return mines, safes
+
+    def set_row(self, pivot, row):
+        """
+        Stores `row` under `pivot`, replacing any previous row.
+        """
+        if pivot in self.rows:
+            self.remove_row(pivot)
+        self.rows[pivot] = row
+        for cell in row[0]:
+            self.columns.setdefault(cell, set()).add(pivot)
+        self.changed.add(pivot)
+
+    def remove_row(self, pivot):
+        """
+        Removes and returns the row stored under `pivot`.
+        """
+        row = self.rows.pop(pivot)
+        for cell in row[0]:
+            pivots = self.columns[cell]
+            pivots.discard(pivot)
+            if not pivots:
+                del self.columns[cell]
+        self.changed.discard(pivot)
+        return row
+
+    @staticmethod
+    def eliminate(row, pivot_row, pivot):
+        """
+        Returns an integer combination of `row` and `pivot_row`
+        in which the coefficient of `pivot` is zero.
+        """
+        coefficients, constant = row
+        pivot_coefficients, pivot_constant = pivot_row
+        factor = pivot_coefficients[pivot]
+        other_factor = coefficients[pivot]
+
+        result = {cell: factor * value for cell, value in coefficients.items()}
+        for cell, value in pivot_coefficients.items():
+            combined = result.get(cell, 0) - other_factor * value
+            if combined:
+                result[cell] = combined
+            else:
+                result.pop(cell, None)
+        return result, factor * constant - other_factor * pivot_constant
+
+    @staticmethod
+    def normalize(coefficients, constant, pivot):
+        """
+        Divides a row by the greatest common divisor of its numbers,
+        and makes the coefficient of `pivot` positive.
+        """
+        divisor = math.gcd(constant, *coefficients.values())
+        if coefficients[pivot] < 0:
+            divisor = -divisor
+        if divisor != 1:
+            coefficients = {cell: value // divisor for cell, value in coefficients.items()}
+            constant //= divisor
+        return coefficients, constant
 
 
 class MinesweeperAI:
@@ -156,12 +514,15 @@ class MinesweeperAI:
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, linear=True):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -169,8 +530,84 @@ class MinesweeperAI:
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Set of sentences about the game known to be true
+        self.knowledge = set()
+
+        # Map from each cell to the sentences in the knowledge base mentioning it
+        self.index = dict()
+
+        # Sentences added since they were last used for inference
+        self.pending = set()
+
+        # Mine configurations of frontier components, keyed by their sentences
+        self.solution_cache = dict()
+
+        # Sentences as a system of linear equations, if enabled
+        self.equations = LinearSystem() if linear else None
+
+    def make_sentence(self, cells, count):
+        """
+        Creates a sentence about `cells` in the representation used by the AI.
+        """
+        return Sentence(cells, count)
+
+    def positions(self, sentence):
+        """
+        Returns the keys under which `sentence` is indexed, one per cell.
+        """
+        return sentence.cells
+
+    def position(self, cell):
+        """
+        Returns the key under which the sentences mentioning `cell` are indexed.
+        """
+        return cell
+
+    def cell_at(self, position):
+        """
+        Returns the cell indexed under the key `position`.
+        """
+        return position
+
+    def sentence_mines(self, sentence):
+        """
+        Returns the set of cells in `sentence` known to be mines.
+        """
+        return sentence.known_mines(self.safes)
+
+    def sentence_safes(self, sentence):
+        """
+        Returns the set of cells in `sentence` known to be safe.
+        """
+        return sentence.known_safes(self.mines)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and indexes it by its cells.
+        Empty and duplicate sentences are ignored.
+        Returns True if the sentence was added.
+        """
+        if not len(sentence) or sentence in self.knowledge:
+            return False
+
+        self.knowledge.add(sentence)
+        self.pending.add(sentence)
+        for position in self.positions(sentence):
+            self.index.setdefault(position, set()).add(sentence)
+        return True
+
+    def remove_sentence(self, sentence):
+        """
+        Removes a sentence from the knowledge base and from the cell index.
+        """
+        self.knowledge.discard(sentence)
+        self.pending.discard(sentence)
+        for position in self.positions(sentence):
+            sentences = self.index.get(position)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.index[position]
 
     def mark_mine(self, cell):
         """
@@ -178,11 +615,15 @@ class MinesweeperAI:
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
-            # delete sentence with empty cells
-            if not sentence.cells:
-                self.knowledge.remove(sentence)
+        if self.equations is not None:
+            self.equations.assign(cell, 1)
+
+        # Only sentences mentioning the cell are affected.
+        # Each of them is replaced by its reduced version;
+        # sentences left without cells are dropped by add_sentence.
+        for sentence in tuple(self.index.get(self.position(cell), ())):
+            self.remove_sentence(sentence)
+            self.add_sentence(sentence.without_mine(cell))
 
     def mark_safe(self, cell):
         """
@@ -190,81 +631,136 @@ class MinesweeperAI:
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
-            # delete sentence with empty cells
-            if not sentence.cells:
-                self.knowledge.remove(sentence)
+        if self.equations is not None:
+            self.equations.assign(cell, 0)
+
+        for sentence in tuple(self.index.get(self.position(cell), ())):
+            self.remove_sentence(sentence)
+            self.add_sentence(sentence.without_safe(cell))
 
     def update_knowledge_base(self):
         """
         Mark any additional cells as safe or as mine if it can be concluded based on the AI's knowledge base
         """
-        for sentence in self.knowledge:
-            for safe_cell in sentence.known_safes(self.mines):
-                self.mark_safe(safe_cell)
+        # Sentences that were already checked cannot settle any new cells,
+        # since every change to a sentence produces a new pending one.
+        # Marking cells adds reduced sentences, so repeat until all are checked.
+        checked = set()
+        unchecked = set(self.pending)
+        while unchecked:
+            for sentence in unchecked:
+                # Skip sentences replaced by marking earlier in this pass
+                if sentence not in self.knowledge:
+                    continue
+
+                for safe_cell in self.sentence_safes(sentence):
+                    self.mark_safe(safe_cell)
+
+                for mine in self.sentence_mines(sentence):
+                    self.mark_mine(mine)
 
-            for mine in sentence.known_mines(self.safes):
-                self.mark_mine(mine)
+            checked.update(unchecked)
+            unchecked = self.pending - checked
+
+    def solve_linear_system(self):
+        """
+        Mark any cells as safe or as mine that the linear system
+        of all sentences forces to be so
+        """
+        if self.equations is None:
+            return
+
+        mines, safes = self.equations.deduce()
+        for mine in mines:
+            self.mark_mine(mine)
+        for safe_cell in safes:
+            self.mark_safe(safe_cell)
+
+    def related_sentences(self, sentence):
+        """
+        Returns the set of sentences in the knowledge base that share
+        at least one cell with `sentence`, excluding the sentence itself.
+        """
+        related = set()
+        for position in self.positions(sentence):
+            related.update(self.index.get(position, ()))
+        related.discard(sentence)
+        return related
 
     def infer_new_sentences(self):
         """
         Add any new sentences to the AI's knowledge base if they can be inferred from existing knowledge
         """
-        for sentence_1 in deepcopy(self.knowledge):
-            # Prevent comparing a sentence with itself
-            knowledge_without_s1 = deepcopy(self.knowledge)
-            knowledge_without_s1.remove(sentence_1)
-            for sentence_2 in knowledge_without_s1:
+        # Pairs of sentences that were both known during an earlier pass
+        # have already been compared, so only pending sentences need to be
+        # compared, and only with the sentences they share a cell with.
+        pending, self.pending = self.pending, set()
+
+        for sentence_1 in pending:
+            if sentence_1 not in self.knowledge:
+                continue
+
+            for sentence_2 in self.related_sentences(sentence_1):
 
                 # Any time we have two sentences set1 = count1 and set2 = count2
                 # where set2 is a subset of set1, then we can construct
                 # the new sentence set1 - set2 = count1 - count2
-                if sentence_2.cells.issubset(sentence_1.cells):
-                    new_sentence_cells = sentence_1.cells.difference(sentence_2.cells)
-                    new_sentence_count = sentence_1.count - sentence_2.count
-                    new_sentence = Sentence(new_sentence_cells, new_sentence_count)
-                    # Avoid duplicate sentences in knowledge base
-                    if new_sentence not in self.knowledge:
-                        self.knowledge.append(new_sentence)
+                if sentence_2.issubset(sentence_1):
+                    self.add_sentence(sentence_1.difference(sentence_2))
+                elif sentence_1.issubset(sentence_2):
+                    self.add_sentence(sentence_2.difference(sentence_1))
 
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
         safe cell, how many neighboring cells have mines in them.
         """
-        # mark the cell as a move that has been made
-        self.moves_made.add(cell)
+        self.add_knowledge_many([(cell, count)])
+
+    def add_knowledge_many(self, cells_and_counts):
+        """
+        Called when the Minesweeper board reveals several safe cells at once,
+        such as a region opened by a flood fill, with a list of `(cell, count)`
+        pairs. All facts are added first, and inference runs only once.
+        """
+        cells_and_counts = list(cells_and_counts)
 
-        # mark the cell as safe
-        self.mark_safe(cell)
+        for cell, _ in cells_and_counts:
+            # mark the cell as a move that has been made
+            self.moves_made.add(cell)
 
-        # add a new sentence to the AI's knowledge base based on the value of `cell` and `count`
-        new_sentence_cells = []
+            # mark the cell as safe
+            self.mark_safe(cell)
 
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+        for cell, count in cells_and_counts:
+            # add a new sentence to the AI's knowledge base based on the value of `cell` and `count`
+            new_sentence_cells = []
 
-                # Add cell to new sentence if in bounds and not already played
-                if 0 <= i < self.height and 0 <= j < self.width:
+            for i in range(cell[0] - 1, cell[0] + 2):
+                for j in range(cell[1] - 1, cell[1] + 2):
 
-                    if (i, j) not in self.moves_made:
-                        new_sentence_cells.append((i, j))
+                    # Add cell to new sentence if in bounds and not already known
+                    if 0 <= i < self.height and 0 <= j < self.width:
 
-        # Only add sentence if cells are not empty
-        if new_sentence_cells:
-            new_sentence = Sentence(new_sentence_cells, count)
-            self.knowledge.append(new_sentence)
+                        if (i, j) in self.mines:
+                            count -= 1
+                        elif (i, j) not in self.safes:
+                            new_sentence_cells.append((i, j))
 
-        # Update knowledge base and infer new sentences iteratively until nothing new can be learned
-        new_knowledge_gained = True
-        new_mines_identified = True
-        new_safes_identified = True
+            # Empty sentences are not added
+            self.add_sentence(self.make_sentence(new_sentence_cells, count))
+            if self.equations is not None:
+                self.equations.add_equation(new_sentence_cells, count)
 
-        while new_knowledge_gained or new_mines_identified or new_safes_identified:
-            old_knowledge = len(self.knowledge)
-            num_mines_old = len(self.mines)
-            num_safes_old = len(self.safes)
+        # Update knowledge base and infer new sentences iteratively until nothing new can be learned.
+        # Every new sentence, whether added, inferred or reduced by marking a cell,
+        # is pending until it has been used, so the loop ends once none are left.
+        while True:
+
+            # Mark cells that the linear system forces, which reduces the affected sentences
+            self.solve_linear_system()
+            if not self.pending:
+                break
 
             # Mark any additional cells as safe or as mine if it can be concluded based on the AI's knowledge base
             self.update_knowledge_base()
@@ -272,10 +768,6 @@ class MinesweeperAI:
             # Add any new sentences to the AI's knowledge base if they can be inferred from existing knowledge
             self.infer_new_sentences()
 
-            new_knowledge_gained = old_knowledge != len(self.knowledge)
-            new_mines_identified = num_mines_old != len(self.mines)
-            new_safes_identified = num_safes_old != len(self.safes)
-
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -284,8 +776,10 @@ class MinesweeperAI:
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
+        # Sort the candidates so that the choice only depends on the random
+        # state, not on the order in which cells were marked safe
         if len(self.safes) > len(self.moves_made):
-            return choice(tuple(self.safes.difference(self.moves_made)))
+            return choice(sorted(self.safes.difference(self.moves_made)))
 
         return None
 
@@ -297,8 +791,8 @@ class MinesweeperAI:
             2) are not known to be mines
         """
         candidates = set()
-        for i in range(self.height - 1):
-            for j in range(self.width - 1):
+        for i in range(self.height):
+            for j in range(self.width):
                 if ((i, j) not in self.moves_made) and ((i, j) not in self.mines):
                     candidates.add((i, j))
 
@@ -306,3 +800,329 @@ class MinesweeperAI:
             return None
 
         return choice(tuple(candidates))
+
+    def make_guess_move(self):
+        """
+        Returns the move with the lowest probability of being a mine
+        among cells that have not been chosen and are not known to be mines.
+        Ties are broken randomly. Returns None if no such cell is left.
+        """
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return None
+
+        lowest = min(probabilities.values())
+        return choice(sorted(
+            cell for cell, probability in probabilities.items()
+            if probability == lowest
+        ))
+
+    def frontier_components(self):
+        """
+        Splits the knowledge base into components of sentences that
+        are connected through shared cells. Sentences in different
+        components constrain disjoint sets of cells.
+        Returns a list of frozensets of sentences.
+        """
+        components = []
+        seen = set()
+        for sentence in self.knowledge:
+            if sentence in seen:
+                continue
+
+            component = {sentence}
+            stack = [sentence]
+            while stack:
+                for other in self.related_sentences(stack.pop()):
+                    if other not in component:
+                        component.add(other)
+                        stack.append(other)
+
+            seen.update(component)
+            components.append(frozenset(component))
+
+        return components
+
+    def component_solutions(self, component):
+        """
+        Enumerates all mine configurations of the cells in `component`
+        that are consistent with each of its sentences.
+
+        Returns a dictionary mapping a number of mines `k` to a pair
+        `(configurations, cell_mines)`, where `configurations` is the number
+        of consistent configurations with `k` mines, and `cell_mines` maps
+        each cell to the number of those configurations in which it is a mine.
+        Returns None if the enumeration takes more than GUESS_NODE_LIMIT steps.
+        """
+        if component in self.solution_cache:
+            return self.solution_cache[component]
+
+        sentences = list(component)
+        sentences_of = dict()
+        for index, sentence in enumerate(sentences):
+            for position in self.positions(sentence):
+                sentences_of.setdefault(position, []).append(index)
+
+        # Order cells breadth-first through shared sentences, so that
+        # constraints close early, and independently of the sentence order.
+        # Components are connected, so a single search reaches every cell.
+        # Cells are handled by their index keys until the search is done.
+        cells = [min(sentences_of)]
+        seen = set(cells)
+        for cell in cells:
+            neighbors = set()
+            for index in sentences_of[cell]:
+                neighbors.update(self.positions(sentences[index]))
+            for neighbor in sorted(neighbors.difference(seen)):
+                seen.add(neighbor)
+                cells.append(neighbor)
+
+        # Mines still needed and cells still unassigned for each sentence
+        needed = [sentence.count for sentence in sentences]
+        unassigned = [len(sentence) for sentence in sentences]
+
+        solutions = dict()
+        mines = []
+        steps = 0
+
+        def backtrack(position):
+            nonlocal steps
+            steps += 1
+            if steps > GUESS_NODE_LIMIT:
+                return False
+
+            if position == len(cells):
+                configurations, cell_mines = solutions.get(len(mines), (0, dict()))
+                for cell in mines:
+                    cell_mines[cell] = cell_mines.get(cell, 0) + 1
+                solutions[len(mines)] = (configurations + 1, cell_mines)
+                return True
+
+            cell = cells[position]
+            for value in (0, 1):
+                consistent = True
+                for index in sentences_of[cell]:
+                    needed[index] -= value
+                    unassigned[index] -= 1
+                    if not 0 <= needed[index] <= unassigned[index]:
+                        consistent = False
+
+                if consistent:
+                    if value:
+                        mines.append(cell)
+                    completed = backtrack(position + 1)
+                    if value:
+                        mines.pop()
+                else:
+                    completed = True
+
+                for index in sentences_of[cell]:
+                    needed[index] += value
+                    unassigned[index] += 1
+
+                if not completed:
+                    return False
+
+            return True
+
+        if backtrack(0):
+            solutions = {
+                mines: (configurations, {
+                    self.cell_at(position): count
+                    for position, count in cell_mines.items()
+                })
+                for mines, (configurations, cell_mines) in solutions.items()
+            }
+        else:
+            solutions = None
+
+        self.solution_cache[component] = solutions
+        return solutions
+
+    def mine_probabilities(self):
+        """
+        Returns a dictionary mapping every cell that has not been chosen and
+        is not known to be a mine to its probability of being a mine.
+
+        Each frontier component's configurations are enumerated separately.
+        If the total number of mines is known, configurations are weighted by
+        the number of ways to place the remaining mines on the cells that no
+        sentence constrains. Components too large to enumerate fall back to
+        the highest mine density among the sentences containing each cell.
+        """
+        unknown = set(
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if (i, j) not in self.moves_made and (i, j) not in self.mines
+        )
+        probabilities = {cell: 0 for cell in unknown.intersection(self.safes)}
+        unknown.difference_update(self.safes)
+        if not unknown:
+            return probabilities
+
+        # Enumerate each component, keeping cached results of current components only
+        components = self.frontier_components()
+        self.solution_cache = {
+            component: self.solution_cache[component]
+            for component in components
+            if component in self.solution_cache
+        }
+        enumerated = []
+        for component in components:
+            solutions = self.component_solutions(component)
+            if solutions is not None:
+                cells = set()
+                for sentence in component:
+                    cells.update(map(self.cell_at, self.positions(sentence)))
+                enumerated.append((cells, solutions))
+                continue
+
+            for sentence in component:
+                density = sentence.count / len(sentence)
+                for cell in map(self.cell_at, self.positions(sentence)):
+                    probabilities[cell] = max(probabilities.get(cell, 0), density)
+
+        # Cells not mentioned by any sentence
+        unconstrained = unknown.difference(probabilities)
+        for cells, _ in enumerated:
+            unconstrained.difference_update(cells)
+
+        # Number of mines left for the cells that are not known yet
+        remaining = None
+        if self.total_mines is not None:
+            remaining = self.total_mines - len(self.mines)
+
+        def weight(mines):
+            """
+            Number of ways to place the remaining mines on unconstrained
+            cells, given that `mines` mines are placed on the frontier.
+            """
+            if remaining is None:
+                return 1
+            if not 0 <= remaining - mines <= len(unconstrained):
+                return 0
+            return math.comb(len(unconstrained), remaining - mines)
+
+        def combine(distributions):
+            """
+            Combines distributions of configuration counts by number of mines
+            of independent components into a single distribution.
+            """
+            combined = {0: 1}
+            for distribution in distributions:
+                result = dict()
+                for mines_1, count_1 in combined.items():
+                    for mines_2, count_2 in distribution.items():
+                        result[mines_1 + mines_2] = result.get(mines_1 + mines_2, 0) + count_1 * count_2
+                combined = result
+            return combined
+
+        distributions = [
+            {mines: configurations for mines, (configurations, _) in solutions.items()}
+            for _, solutions in enumerated
+        ]
+        total = combine(distributions)
+        normalization = sum(count * weight(mines) for mines, count in total.items())
+
+        # Fall back to weighting all configurations equally
+        # if the mine count cannot be matched
+        if not normalization:
+            remaining = None
+            normalization = sum(total.values())
+
+        for index, (cells, solutions) in enumerate(enumerated):
+            others = combine(distributions[:index] + distributions[index + 1:])
+            expected = dict.fromkeys(cells, 0)
+            for mines, (_, cell_mines) in solutions.items():
+                others_weight = sum(
+                    count * weight(mines + other_mines)
+                    for other_mines, count in others.items()
+                )
+                for cell, count in cell_mines.items():
+                    expected[cell] += count * others_weight
+
+            for cell in cells:
+                probabilities[cell] = expected[cell] / normalization
+
+        # Unconstrained cells share the mines not placed on the frontier.
+        # Without a mine count, use the average probability of the frontier instead.
+        if unconstrained:
+            if remaining is not None:
+                frontier_mines = sum(
+                    count * weight(mines) * mines for mines, count in total.items()
+                ) / normalization
+                density = (remaining - frontier_mines) / len(unconstrained)
+            elif probabilities:
+                density = sum(probabilities.values()) / len(probabilities)
+            else:
+                density = 0.5
+            for cell in unconstrained:
+                probabilities[cell] = density
+
+        return probabilities
+
+
+class BitmaskMinesweeperAI(MinesweeperAI):
+    """
+    Minesweeper game player whose knowledge base consists of `BitSentence`s.
+    Sentences are indexed by the bit positions of their cells, and the known
+    mines and safes are also kept as bitmasks to check sentences against.
+    """
+
+    def __init__(self, height=8, width=8, mines=None, linear=True):
+        super().__init__(height, width, mines, linear)
+
+        # Bitmasks of the cells known to be mines or safe
+        self.mine_mask = 0
+        self.safe_mask = 0
+
+    def make_sentence(self, cells, count):
+        """
+        Creates a bitmask sentence about `cells`.
+        """
+        return BitSentence.from_cells(cells, count, self.width)
+
+    def positions(self, sentence):
+        """
+        Returns the bit positions of the cells in `sentence`.
+        """
+        return sentence.bits
+
+    def position(self, cell):
+        """
+        Returns the bit position of `cell`.
+        """
+        return cell[0] * self.width + cell[1]
+
+    def cell_at(self, position):
+        """
+        Returns the cell at the bit position `position`.
+        """
+        return divmod(position, self.width)
+
+    def sentence_mines(self, sentence):
+        """
+        Returns the set of cells in `sentence` known to be mines.
+        """
+        return sentence.known_mines(self.safe_mask)
+
+    def sentence_safes(self, sentence):
+        """
+        Returns the set of cells in `sentence` known to be safe.
+        """
+        return sentence.known_safes(self.mine_mask)
+
+    def mark_mine(self, cell):
+        """
+        Marks a cell as a mine, in the bitmask of mines as well.
+        """
+        self.mine_mask |= 1 << (cell[0] * self.width + cell[1])
+        super().mark_mine(cell)
+
+    def mark_safe(self, cell):
+        """
+        Marks a cell as safe, in the bitmask of safe cells as well.
+        """
+        self.safe_mask |= 1 << (cell[0] * self.width + cell[1])
+        super().mark_safe(cell)
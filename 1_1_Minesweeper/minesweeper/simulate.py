@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import multiprocessing
+import random
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI, BitmaskMinesweeperAI
+
+AIS = {
+    "set": MinesweeperAI,
+    "bitmask": BitmaskMinesweeperAI
+}
+
+# Beginner, intermediate and expert boards as (height, width, mines)
+BOARDS = [(8, 8, 10), (16, 16, 40), (16, 30, 99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper games headlessly and report how the AI performs."
+    )
+    parser.add_argument("-n", "--games", type=int, default=1000,
+                        help="number of games per board")
+    parser.add_argument("-b", "--boards", nargs="+", type=parse_board, default=BOARDS,
+                        help="boards to play, as HEIGHTxWIDTHxMINES")
+    parser.add_argument("-a", "--ai", choices=sorted(AIS), default="set",
+                        help="knowledge representation used by the AI")
+    parser.add_argument("--no-linear", dest="linear", action="store_false",
+                        help="disable the AI's linear equation solver")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed from which each game's seed is derived")
+    args = parser.parse_args()
+
+    boards = args.boards
+    results = simulate(boards, args.games, args.ai, args.linear, args.processes, args.seed)
+
+    print(f"{'board':>10} {'density':>8} {'games':>6} {'win rate':>9} "
+          f"{'moves':>7} {'ms/call':>8}  decisions")
+    for board in boards:
+        height, width, mines = board
+        summary = summarize(results[board])
+        print(f"{f'{height}x{width}x{mines}':>10} {mines / (height * width):>8.3f} "
+              f"{summary['games']:>6} {summary['win_rate']:>9.3f} "
+              f"{summary['moves']:>7.1f} {summary['ms_per_call']:>8.3f}  "
+              f"{summary['digest'][:16]}")
+
+
+def parse_board(board):
+    """
+    Parse a board given as HEIGHTxWIDTHxMINES into a tuple of integers.
+    """
+    try:
+        height, width, mines = (int(value) for value in board.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid board: {board}")
+    if height < 1 or width < 1 or mines < 0:
+        raise argparse.ArgumentTypeError(f"invalid board: {board}")
+    if mines >= height * width:
+        raise argparse.ArgumentTypeError(f"too many mines: {board}")
+    return height, width, mines
+
+
+def simulate(boards, games, ai, linear=True, processes=None, seed=0):
+    """
+    Play `games` games on each of `boards` across a pool of processes.
+    Return a dictionary mapping each board to the list of its game results,
+    ordered by game number.
+    """
+    tasks = [
+        (board, game, ai, linear, f"{seed}-{board}-{game}")
+        for board in boards
+        for game in range(games)
+    ]
+    results = {board: [None] * games for board in boards}
+    with multiprocessing.Pool(processes) as pool:
+        for board, game, result in pool.imap_unordered(play_task, tasks, chunksize=16):
+            results[board][game] = result
+    return results
+
+
+def play_task(task):
+    """
+    Play a single game described by a task tuple in a worker process.
+    """
+    board, game, ai, linear, seed = task
+    return board, game, play(*board, AIS[ai], seed, linear)
+
+
+def play(height, width, mines, ai_class, seed, linear=True):
+    """
+    Play one game until the AI hits a mine, reveals every safe cell,
+    or has no moves left. Mines are placed after the first move,
+    so that the first cell chosen is always safe, and cells without
+    nearby mines open their neighbors.
+
+    Return a dictionary with whether the game was won, the number of moves,
+    the number of `add_knowledge_many` calls and the total time spent in them,
+    and a digest of the sequence of moves made.
+    """
+    random.seed(seed)
+    ai = ai_class(height=height, width=width, mines=mines, linear=linear)
+
+    game = None
+    moves = []
+    won = False
+    calls = 0
+    knowledge_time = 0
+    while True:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_guess_move()
+            if move is None:
+                break
+        moves.append(move)
+
+        if game is None:
+            game = Minesweeper(height=height, width=width, mines=mines, safe=[move])
+
+        if game.is_mine(move):
+            break
+
+        start = time.perf_counter()
+        ai.add_knowledge_many(game.reveal(move))
+        knowledge_time += time.perf_counter() - start
+        calls += 1
+
+        if len(ai.moves_made) == height * width - mines:
+            won = True
+            break
+
+    return {
+        "won": won,
+        "moves": len(moves),
+        "calls": calls,
+        "time": knowledge_time,
+        "digest": hashlib.sha1(repr(moves).encode()).hexdigest()
+    }
+
+
+def summarize(results):
+    """
+    Aggregate the results of the games played on one board.
+    The digest combines the moves of all games, so two runs made
+    the same decisions exactly if their digests are equal.
+    """
+    calls = sum(result["calls"] for result in results)
+    digest = hashlib.sha1()
+    for result in results:
+        digest.update(result["digest"].encode())
+
+    return {
+        "games": len(results),
+        "win_rate": sum(result["won"] for result in results) / len(results),
+        "moves": sum(result["moves"] for result in results) / len(results),
+        "ms_per_call": 1000 * sum(result["time"] for result in results) / calls if calls else 0,
+        "digest": digest.hexdigest()
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from pagerank import (
+    DAMPING, METHODS, EdgeFile, LinkMatrix, iterate_pagerank, power_iteration,
+    sample_pagerank, write_edge_file
+)
+
+# Ranks of the reference solution change by less than this in L1 norm
+REFERENCE_TOLERANCE = 1e-13
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <title>{page}</title>
+    </head>
+    <body>
+        <h1>{page}</h1>
+
+        <div>Links:</div>
+        <ul>
+{links}
+        </ul>
+    </body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic link graph and compare how PageRank methods perform on it."
+    )
+    parser.add_argument("-n", "--pages", type=int, default=10000,
+                        help="number of pages")
+    parser.add_argument("-l", "--links", type=int, default=5,
+                        help="number of links of each page that has links")
+    parser.add_argument("--dangling", type=float, default=0.1,
+                        help="fraction of pages without links")
+    parser.add_argument("--self-links", type=float, default=0.05,
+                        help="fraction of pages that also link to themselves")
+    parser.add_argument("-d", "--damping", type=float, default=DAMPING,
+                        help="damping factor")
+    parser.add_argument("-t", "--tolerance", type=float, default=1e-8,
+                        help="tolerance of the iterative methods")
+    parser.add_argument("--samples", type=int, default=100000,
+                        help="number of samples for the sampling method")
+    parser.add_argument("-m", "--methods", nargs="+", default=["sampling", *METHODS, "out_of_core"],
+                        choices=["sampling", *METHODS, "out_of_core"],
+                        help="methods to compare")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip measuring peak memory, which runs each method again")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed of the graph and of the sampling method")
+    parser.add_argument("--corpus", metavar="DIRECTORY",
+                        help="also write the graph as a corpus of HTML pages")
+    parser.add_argument("--edges", metavar="FILE",
+                        help="also write the graph as a binary edge file")
+    args = parser.parse_args()
+
+    edges = generate_graph(args.pages, args.links, args.dangling, args.self_links, args.seed)
+    print(f"Graph: {args.pages} pages, {len(edges)} links (seed {args.seed})")
+    if args.corpus:
+        write_corpus(args.corpus, args.pages, edges)
+    if args.edges:
+        write_edge_file(args.edges, args.pages, edges)
+
+    results = benchmark(args.pages, edges, args.methods, args.damping, args.tolerance,
+                        args.samples, args.seed, args.memory)
+
+    print(f"{'method':>12} {'time (s)':>9} {'peak (MB)':>10} {'iterations':>11} {'L1 error':>10}")
+    for method, result in results.items():
+        peak = f"{result['peak'] / 2 ** 20:.1f}" if result["peak"] is not None else "-"
+        iterations = result["iterations"] if result["iterations"] is not None else "-"
+        print(f"{method:>12} {result['time']:>9.3f} {peak:>10} {iterations:>11} "
+              f"{result['error']:>10.2e}")
+
+
+def generate_graph(n, links, dangling=0.1, self_links=0.05, seed=None):
+    """
+    Return a list of `(source, target)` pairs of page numbers for a
+    synthetic link graph of `n` pages grown by preferential attachment:
+    each new page links to `links` earlier pages, picked with probability
+    proportional to one plus the number of links they already have.
+
+    A `dangling` fraction of pages has no links, and a `self_links`
+    fraction of the pages with links also links to itself. A page may
+    pick the same target twice, so links can be repeated.
+    """
+    rng = random.Random(seed)
+
+    # Each page appears once, plus once for every link to it
+    targets = []
+    edges = []
+    for page in range(n):
+        if targets and rng.random() >= dangling:
+            for _ in range(links):
+                target = rng.choice(targets)
+                edges.append((page, target))
+                targets.append(target)
+            if rng.random() < self_links:
+                edges.append((page, page))
+        targets.append(page)
+    return edges
+
+
+def write_corpus(directory, n, edges):
+    """
+    Write a graph of `n` pages as a directory of HTML pages named
+    `0.html`, `1.html` and so on, that `crawl` can read.
+    """
+    links = [[] for _ in range(n)]
+    for source, target in edges:
+        links[source].append(target)
+
+    os.makedirs(directory, exist_ok=True)
+    for page in range(n):
+        items = "\n".join(
+            f'            <li><a href="{target}.html">{target}</a></li>'
+            for target in links[page]
+        )
+        with open(os.path.join(directory, f"{page}.html"), "w") as f:
+            f.write(PAGE_TEMPLATE.format(page=page, links=items))
+
+
+def benchmark(n, edges, methods, damping_factor, tolerance, samples, seed=None, memory=True):
+    """
+    Run each of `methods` on a graph of `n` pages, and return a dictionary
+    mapping each method to its running time, peak memory in bytes (None
+    if `memory` is false), number of iterations (None for sampling) and
+    the L1 distance of its ranks from a high-precision reference.
+    """
+    pages = [f"{page}.html" for page in range(n)]
+    corpus = {page: set() for page in pages}
+    for source, target in edges:
+        if source != target:
+            corpus[pages[source]].add(pages[target])
+
+    matrix = LinkMatrix(pages, edges)
+    reference = power_iteration(matrix, damping_factor, REFERENCE_TOLERANCE,
+                                max_iterations=100000, method="gauss_seidel")
+    reference = dict(zip(pages, reference))
+
+    with tempfile.TemporaryDirectory() as directory:
+        edge_file = os.path.join(directory, "graph.edges")
+        if "out_of_core" in methods:
+            write_edge_file(edge_file, n, edges)
+
+        results = dict()
+        for method in methods:
+            def run():
+                history = []
+                if method == "sampling":
+                    ranks = sample_pagerank(corpus, damping_factor, samples, seed=seed)
+                elif method == "out_of_core":
+                    with EdgeFile(edge_file) as graph:
+                        ranks = power_iteration(graph, damping_factor, tolerance, history=history)
+                    ranks = dict(zip(pages, ranks))
+                else:
+                    ranks = iterate_pagerank(corpus, damping_factor, tolerance, method=method,
+                                             history=history)
+                return ranks, history
+
+            start = time.perf_counter()
+            ranks, history = run()
+            elapsed = time.perf_counter() - start
+
+            # Measure memory in a separate run, as tracing slows it down
+            peak = None
+            if memory:
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            results[method] = {
+                "time": elapsed,
+                "peak": peak,
+                "iterations": len(history) if method != "sampling" else None,
+                "error": sum(abs(ranks[page] - reference[page]) for page in pages)
+            }
+    return results
+
+
+if __name__ == "__main__":
+    main()
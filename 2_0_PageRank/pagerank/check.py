@@ -0,0 +1,71 @@
+import argparse
+import random
+import sys
+
+from pagerank import METHODS, iterate_pagerank
+
+# Ranks of the reference solution change by less than this in L1 norm
+REFERENCE_TOLERANCE = 1e-13
+
+# Corpora that once broke a method, as (corpus, damping factor, tolerance)
+REGRESSIONS = [
+    # Nearly singular quadratic extrapolation, which divided by zero
+    ({0: set(), 1: {0}, 2: set(), 3: set(), 4: set(), 5: {3}, 6: {0}, 7: set(), 8: {0}, 9: {0}},
+     0.5, 1e-8)
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run every PageRank method on random small corpora and on "
+                    "known regressions, and check each against a reference solution."
+    )
+    parser.add_argument("-n", "--corpora", type=int, default=1000,
+                        help="number of random corpora")
+    parser.add_argument("-p", "--pages", type=int, default=10,
+                        help="largest number of pages of a random corpus")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed from which each corpus's seed is derived")
+    args = parser.parse_args()
+
+    cases = list(REGRESSIONS)
+    for number in range(args.corpora):
+        rng = random.Random(f"{args.seed}-{number}")
+        corpus = generate_corpus(rng, rng.randint(1, args.pages))
+        cases.append((corpus, rng.choice([0.5, 0.85, 0.99]), 1e-8))
+
+    failures = 0
+    for corpus, damping_factor, tolerance in cases:
+        reference = iterate_pagerank(corpus, damping_factor, REFERENCE_TOLERANCE)
+        for method in METHODS:
+            try:
+                ranks = iterate_pagerank(corpus, damping_factor, tolerance, method=method)
+                error = sum(abs(ranks[page] - reference[page]) for page in corpus)
+            except ArithmeticError as e:
+                error = e
+            # Allow for the error left when the change drops below tolerance,
+            # which grows as 1 / (1 - damping factor)
+            if not isinstance(error, float) or error > 100 * tolerance / (1 - damping_factor):
+                failures += 1
+                print(f"{method} (damping {damping_factor}): {error}")
+                print("  corpus:", corpus)
+
+    print(f"{len(cases)} corpora, {failures} failures")
+    if failures:
+        sys.exit(1)
+
+
+def generate_corpus(rng, n):
+    """
+    Return a random corpus of `n` pages named 0 to n - 1, in which some
+    pages have no links.
+    """
+    corpus = dict()
+    for page in range(n):
+        links = rng.randint(0, 3) if rng.random() < 0.7 else 0
+        corpus[page] = set(rng.randrange(n) for _ in range(links)) - {page}
+    return corpus
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,230 @@
+import hashlib
+import heapq
+import json
+import mmap
+import multiprocessing
 import os
+import posixpath
 import random
 import re
+import struct
 import sys
-from copy import deepcopy
+import tempfile
+from array import array
+from collections import deque
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Pattern of links in HTML files, and size of the chunks in which files are read
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+CHUNK_SIZE = 1 << 16
+
+# Iteration stops once the L1 norm of the change in ranks is below TOLERANCE
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+# Methods for iterate_pagerank, and how many iterations apart extrapolation is applied
+METHODS = ["power", "gauss_seidel", "quadratic", "adaptive"]
+EXTRAPOLATION_PERIOD = 10
+
+# Header of binary edge files (magic, number of pages, number of links),
+# and how many links are sorted or read from them at a time
+EDGE_FILE_HEADER = struct.Struct("=8sqq")
+EDGE_FILE_MAGIC = b"PREDGES1"
+EDGE_BLOCK = 1 << 20
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python pagerank.py corpus [index]")
+    index_file = sys.argv[2] if len(sys.argv) == 3 else None
+    corpus = crawl(sys.argv[1], index_file=index_file)
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+
+    # Start iterating from the ranks of the previous run, if any
+    previous = load_index(index_file).get("ranks") if index_file else None
+    ranks = iterate_pagerank(corpus, DAMPING, ranks=previous)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
+    if index_file:
+        index = load_index(index_file)
+        index["ranks"] = ranks
+        save_index(index_file, index)
+
 
-def crawl(directory):
+def crawl(directory, processes=1, index_file=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    Pages in subdirectories are named by their path relative to `directory`.
+    If `index_file` is given, parsed links are kept there between runs
+    (see `crawl_edges`).
     """
-    pages = dict()
+    pages, edges = crawl_edges(directory, processes, index_file)
+    corpus = {page: set() for page in pages}
+    for source, target in edges:
+        corpus[pages[source]].add(pages[target])
+    return corpus
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+
+def crawl_edges(directory, processes=1, index_file=None):
+    """
+    Parse a directory tree of HTML pages, using `processes` processes.
+    Return a sorted list of page names, and a list of `(source, target)`
+    pairs of page numbers for the links between distinct pages of the corpus.
+
+    If `index_file` is given, the links of each page are stored in it along
+    with the page's modification time, size and hash. On later runs, pages
+    whose modification time and size are unchanged are not read at all,
+    pages whose hash is unchanged are not parsed again, and removed pages
+    are dropped from the index.
+    """
+    pages = sorted(find_pages(directory))
+    index = {page: i for i, page in enumerate(pages)}
+
+    stored = load_index(index_file) if index_file else dict()
+    entries = stored.get("pages", dict())
+
+    # Check which pages were added or changed since the index was written
+    stats = dict()
+    tasks = []
+    for page in pages:
+        stat = os.stat(os.path.join(directory, *page.split("/")))
+        stats[page] = (stat.st_mtime_ns, stat.st_size)
+        entry = entries.get(page)
+        if entry is None or (entry["mtime"], entry["size"]) != stats[page]:
+            tasks.append((directory, page, entry["hash"] if entry else None))
+
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(index_page, tasks, chunksize=64)
+    else:
+        results = [index_page(*task) for task in tasks]
+
+    for (_, page, _), (digest, links) in zip(tasks, results):
+        entry = entries.get(page, dict())
+        entry["hash"] = digest
+        if links is not None:
+            entry["links"] = sorted(links)
+        entries[page] = entry
+
+    entries = {page: entries[page] for page in pages}
+    for page in pages:
+        entries[page]["mtime"], entries[page]["size"] = stats[page]
+
+    if index_file:
+        stored["pages"] = entries
+        save_index(index_file, stored)
 
     # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+    edges = []
+    for source, page in enumerate(pages):
+        for link in entries[page]["links"]:
+            target = index.get(link)
+            if target is not None and target != source:
+                edges.append((source, target))
+
+    return pages, edges
+
+
+def load_index(index_file):
+    """
+    Return the contents of a crawl index file,
+    or an empty index if the file does not exist.
+    """
+    if not os.path.exists(index_file):
+        return dict()
+    with open(index_file) as f:
+        return json.load(f)
+
+
+def save_index(index_file, index):
+    """
+    Write a crawl index file, replacing it only once it is complete.
+    """
+    with open(index_file + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_file + ".tmp", index_file)
+
+
+def index_page(directory, page, known_hash=None):
+    """
+    Return the hash of a page's file, and the set of pages it links to.
+    If the hash equals `known_hash`, the page is not parsed and the
+    set of links is None.
+    """
+    path = os.path.join(directory, *page.split("/"))
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
 
+    if digest.hexdigest() == known_hash:
+        return known_hash, None
+    return digest.hexdigest(), parse_page(directory, page)
+
+
+def find_pages(directory):
+    """
+    Return the paths of all HTML files in a directory tree,
+    relative to `directory` and with "/" as separator.
+    """
+    pages = []
+    for root, _, filenames in os.walk(directory):
+        relative = os.path.relpath(root, directory)
+        for filename in filenames:
+            if not filename.endswith(".html"):
+                continue
+            if relative == os.curdir:
+                pages.append(filename)
+            else:
+                pages.append(posixpath.join(*relative.split(os.sep), filename))
     return pages
 
 
+def parse_page(directory, page):
+    """
+    Return the set of pages linked to by `page`, with links resolved
+    relative to the page's own directory.
+    """
+    base = posixpath.dirname(page)
+    with open(os.path.join(directory, *page.split("/"))) as f:
+        return set(
+            posixpath.normpath(posixpath.join(base, link))
+            for link in extract_links(f)
+        )
+
+
+def extract_links(f):
+    """
+    Yield the targets of all links in a file, reading it in chunks
+    of CHUNK_SIZE characters rather than all at once.
+    """
+    buffer = ""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+
+        end = 0
+        for match in LINK_PATTERN.finditer(buffer):
+            yield match.group(1)
+            end = match.end()
+
+        # Keep any tag after the last link, which may continue in the next chunk
+        start = buffer.rfind("<", end)
+        buffer = buffer[start:] if start != -1 else ""
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -80,7 +256,7 @@ def transition_model(corpus, page, damping_factor):
     return prob_dist
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, processes=1, seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -88,26 +264,78 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    With several `processes`, the samples are split among independent
+    random surfers running in parallel. `seed` makes the result reproducible.
     """
-    counts = dict()
-    current_page = random.choice([*corpus])
-    counts[current_page] = 1
-    for i in range(n-1):
-        # Weights for choosing next link based on current page's transition function
-        transition = transition_model(corpus, current_page, damping_factor)
-        sites = [site for site in corpus]
-        weights = [transition[site] for site in sites]
-        current_page = random.choices(sites, weights)[0]
-        counts[current_page] = counts.get(current_page, 0) + 1
+    matrix = LinkMatrix.from_corpus(corpus)
+    counts = sample_visits(matrix, damping_factor, n, processes, seed)
 
     # Compute and return relative frequencies
-    pagerank_s = dict()
-    for site in corpus:
-        pagerank_s[site] = counts.get(site, 0) / n
-    return pagerank_s
+    return {page: count / n for page, count in zip(matrix.pages, counts)}
+
+
+def sample_visits(matrix, damping_factor, n, processes=1, seed=None):
+    """
+    Return a list counting how often each page of a `LinkMatrix` is
+    visited by random surfers taking `n` samples in total, split among
+    one surfer per process.
+    """
+    rng = random.Random(seed) if seed is not None else random
+    samples = [n // processes + (i < n % processes) for i in range(processes)]
+    tasks = [
+        (matrix, damping_factor, count, rng.getrandbits(64))
+        for count in samples if count
+    ]
+
+    if len(tasks) == 1:
+        return random_walk(*tasks[0])
 
+    with multiprocessing.Pool(len(tasks)) as pool:
+        results = pool.starmap(random_walk, tasks)
+    return [sum(counts) for counts in zip(*results)]
+
+
+def random_walk(matrix, damping_factor, n, seed):
+    """
+    Return a list counting how often each page of a `LinkMatrix` is
+    visited by one random surfer taking `n` samples, starting at random.
 
-def iterate_pagerank(corpus, damping_factor):
+    Each step draws a single random number `u`. If `u < damping_factor`,
+    the surfer follows link number `u / damping_factor * out_degree` of the
+    current page; otherwise, or if the page has no links, it jumps to a page
+    chosen by the rescaled `u`.
+    """
+    rng = random.Random(seed)
+    pages = len(matrix)
+    counts = [0] * pages
+    if not n:
+        return counts
+
+    indptr = matrix.out_indptr
+    indices = matrix.out_indices
+    degrees = matrix.out_degree
+    jump_scale = pages / (1 - damping_factor) if damping_factor < 1 else 0
+    rand = rng.random
+
+    page = rng.randrange(pages)
+    counts[page] += 1
+    for _ in range(n - 1):
+        u = rand()
+        degree = degrees[page]
+        if not degree:
+            page = min(int(u * pages), pages - 1)
+        elif u < damping_factor:
+            page = indices[indptr[page] + min(int(u / damping_factor * degree), degree - 1)]
+        else:
+            page = min(int((u - damping_factor) * jump_scale), pages - 1)
+        counts[page] += 1
+
+    return counts
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE, ranks=None, method="power",
+                     history=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -115,42 +343,651 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Iteration starts from `ranks`, such as the result of an earlier run on
+    a similar corpus, if given; pages missing from it start at 1 / N.
+    `method` is one of METHODS (see `power_iteration`), and the change
+    in each iteration is appended to the list `history`, if given.
     """
-    pagerank_i = dict()
+    matrix = LinkMatrix.from_corpus(corpus)
+    if ranks is not None:
+        ranks = [ranks.get(page, 1 / len(matrix)) for page in matrix.pages]
+    ranks = power_iteration(matrix, damping_factor, tolerance, ranks=ranks, method=method,
+                            history=history)
+    return dict(zip(matrix.pages, ranks))
 
-    # Initial probability for picking any site
-    prob = 1 / len(corpus)
-    for site in corpus:
-        pagerank_i[site] = prob
 
-    # Damping part of the formula is constant:
-    damp = (1 - damping_factor) / len(corpus)
+def update_pagerank(corpus, ranks, damping_factor, added=(), removed=(), tolerance=TOLERANCE):
+    """
+    Return PageRank values for `corpus` after a small change to it, given
+    the PageRank values `ranks` from before the change, and the links
+    `added` and `removed` by the change as `(page, linked page)` pairs.
+    Pages that appear in `corpus` but not in `ranks` are new; pages in `ranks`
+    but not in `corpus` were removed, and their links must be in `removed`.
+
+    The ranks are rescaled to the solution y of y = 1 + damping_factor * L y,
+    where L follows the links of pages that have any. PageRank is y scaled
+    to sum to 1, because random jumps from dangling pages add the same amount
+    to every page. In that form, the old ranks only fail to solve the new
+    equation next to changed links and pages, and this residual is pushed
+    through the graph: a page with residual r adds r to its value and passes
+    damping_factor * r, split among its links, on as residual. Pushing stops
+    once the residuals are small enough to bound the L1 error of the result
+    by tolerance, plus any error `ranks` already had. Only pages near the
+    change are touched.
+    """
+    added_links = dict()
+    removed_links = dict()
+    for page, link in added:
+        added_links.setdefault(page, set()).add(link)
+    for page, link in removed:
+        removed_links.setdefault(page, set()).add(link)
+
+    def old_links(page):
+        links = corpus.get(page, set()) - added_links.get(page, set())
+        return links | removed_links.get(page, set())
+
+    # Share of each page's rank that came from random jumps before the change
+    changed = added_links.keys() | removed_links.keys()
+    dangling_rank = sum(
+        rank for page, rank in ranks.items()
+        if not (old_links(page) if page in changed else corpus.get(page))
+    )
+    jump = ((1 - damping_factor) + damping_factor * dangling_rank) / len(ranks)
+
+    values = {page: ranks.get(page, 0) / jump for page in corpus}
+    residuals = {page: 1 for page in corpus if page not in ranks}
+
+    # The residual changes by what each page with changed links
+    # now passes on, minus what it passed on before
+    for page in changed:
+        value = damping_factor * ranks.get(page, 0) / jump
+        for links, sign in ((old_links(page), -1), (corpus.get(page, set()), 1)):
+            for link in links:
+                if link in corpus:
+                    residuals[link] = residuals.get(link, 0) + sign * value / len(links)
+
+    # The L1 error of y is at most the sum of residuals / (1 - damping_factor),
+    # and y sums to 1 / jump, so this bounds the error of the result by tolerance
+    push_residuals(corpus, values, residuals, damping_factor, tolerance * (1 - damping_factor) / jump)
+
+    total = sum(values.values())
+    return {page: values[page] / total for page in sorted(corpus)}
+
+
+def push_residuals(corpus, values, residuals, damping_factor, tolerance):
+    """
+    Move residuals into `values` until the residuals sum to at most
+    `tolerance` in absolute value, updating both dictionaries in place.
+    Pages missing from `values` count as zero.
 
-    converged = False
+    Pages whose residual exceeds tolerance / N are processed first in,
+    first out. Residuals reaching pages without links are dropped.
+    """
+    threshold = tolerance / len(corpus)
+    queue = deque(page for page, residual in residuals.items() if abs(residual) > threshold)
+    queued = set(queue)
+    total = sum(abs(residual) for residual in residuals.values())
+
+    while queue and total > tolerance:
+        page = queue.popleft()
+        queued.discard(page)
+        residual = residuals.pop(page, 0)
+        total -= abs(residual)
+        if abs(residual) <= threshold:
+            residuals[page] = residual
+            total += abs(residual)
+            continue
+
+        values[page] = values.get(page, 0) + residual
 
-    # Repeat estimation until convergence
-    while not converged:
-        before = deepcopy(pagerank_i)
+        links = corpus[page]
+        if not links:
+            continue
+        share = damping_factor * residual / len(links)
+        for link in links:
+            old = residuals.get(link, 0)
+            value = old + share
+            residuals[link] = value
+            total += abs(value) - abs(old)
+            if abs(value) > threshold and link not in queued:
+                queue.append(link)
+                queued.add(link)
+
+
+def personalized_pagerank(corpus, damping_factor, teleport, tolerance=TOLERANCE):
+    """
+    Return personalized PageRank values for a query, where random jumps
+    (including those from pages without links) go to a page chosen
+    according to `teleport`, a dictionary mapping seed pages to weights.
+
+    As in `update_pagerank`, this solves y = t + damping_factor * L y by
+    pushing residuals, starting from the teleport distribution t, and
+    scales y to sum to 1. Only pages reachable from the seed pages are
+    touched. Pages missing from the returned dictionary have rank 0.
+    """
+    check_teleport(corpus, teleport)
+    total = sum(teleport.values())
+    residuals = {page: weight / total for page, weight in teleport.items() if weight}
+    values = dict()
 
-        # Consider pagerank component through pages that do not link to any other sites
-        non_linking_sites = sum([pagerank_i[page] / len(corpus) if not corpus[page] else 0 for page in corpus])
+    # y sums to at least 1, so this bounds the L1 error by tolerance
+    push_residuals(corpus, values, residuals, damping_factor, tolerance * (1 - damping_factor))
 
-        for site in pagerank_i:
-            new_value = non_linking_sites
-            # Add component for each page that links to the site
-            new_value += sum([before[page] / len(corpus[page]) if (site in corpus[page]) else 0 for page in corpus])
+    total = sum(values.values())
+    return {page: value / total for page, value in values.items()}
 
-            # Update pagerank according to formula
-            pagerank_i[site] = damp + damping_factor * new_value
 
-        # Assume convergence and try to negate it
-        converged = True
-        for site in pagerank_i:
-            if abs(pagerank_i[site] - before[site]) > 0.001:
-                converged = False
+def check_teleport(pages, teleport):
+    """
+    Raise ValueError unless `teleport` maps pages in `pages` to weights
+    that are not negative and not all zero.
+    """
+    for page, weight in teleport.items():
+        if page not in pages:
+            raise ValueError(f"seed page not in corpus: {page}")
+        if weight < 0:
+            raise ValueError(f"negative weight for seed page: {page}")
+    if not any(teleport.values()):
+        raise ValueError("teleport weights are all zero")
+
+
+class WalkIndex:
+    """
+    Random walks stored for answering personalized PageRank queries
+    by Monte Carlo, without walking the graph at query time.
+
+    For every page, `walks` walks start at the page and at each step stop
+    with probability 1 - damping_factor, or otherwise follow a random link.
+    Only where each walk stopped is kept; walks that would follow a link
+    from a page without links end without a result. Walks from a page are generated the
+    first time the page is needed, or in advance by `precompute`.
+    """
+
+    def __init__(self, corpus, damping_factor, walks=100, seed=None):
+        self.matrix = LinkMatrix.from_corpus(corpus)
+        self.damping_factor = damping_factor
+        self.walks = walks
+        self.random = random.Random(seed)
+
+        # Map from page number to the list of page numbers where its walks stopped
+        self.endpoints = dict()
+
+    def precompute(self, pages=None):
+        """
+        Generate the walks of `pages`, or of all pages if None.
+        """
+        if pages is None:
+            pages = self.matrix.pages
+        for page in pages:
+            self.walk(self.matrix.index[page])
+
+    def walk(self, start):
+        """
+        Return the endpoints of the walks from page number `start`.
+        """
+        if start in self.endpoints:
+            return self.endpoints[start]
+
+        indptr = self.matrix.out_indptr
+        indices = self.matrix.out_indices
+        rand = self.random.random
+        endpoints = []
+        for _ in range(self.walks):
+            page = start
+            while True:
+                u = rand()
+                if u >= self.damping_factor:
+                    endpoints.append(page)
+                    break
+                degree = indptr[page + 1] - indptr[page]
+                if not degree:
+                    break
+                page = indices[indptr[page] + min(int(u / self.damping_factor * degree), degree - 1)]
+
+        self.endpoints[start] = endpoints
+        return endpoints
+
+    def query(self, teleport):
+        """
+        Return estimated personalized PageRank values for a dictionary mapping
+        seed pages to weights, with the same meaning as in `personalized_pagerank`.
+        Pages missing from the returned dictionary have an estimated rank of 0.
+
+        Raise ValueError if no walk from the seed pages stopped anywhere,
+        as then there is nothing to estimate the ranks from.
+        """
+        check_teleport(self.matrix.index, teleport)
+
+        # The share of walks from page s stopping at page v estimates
+        # (1 - damping_factor) times entry v of the solution y for s alone,
+        # and the solution for the whole query is their weighted sum
+        scores = dict()
+        for page, weight in teleport.items():
+            if not weight:
+                continue
+            share = weight / self.walks
+            for endpoint in self.walk(self.matrix.index[page]):
+                scores[endpoint] = scores.get(endpoint, 0) + share
+
+        total = sum(scores.values())
+        if not total:
+            raise ValueError("no walk from the seed pages stopped at a page")
+        pages = self.matrix.pages
+        return {pages[endpoint]: score / total for endpoint, score in scores.items()}
+
+
+def top_k(ranks, k):
+    """
+    Return the `k` pages with the highest ranks as a list of
+    `(page, rank)` pairs in descending order of rank,
+    without sorting all pages.
+    """
+    return heapq.nlargest(k, ranks.items(), key=lambda item: item[1])
+
+
+class LinkMatrix:
+    """
+    Column-stochastic link matrix of a corpus, stored in compressed
+    sparse row (CSR) form.
+
+    Pages are numbered in the order of `pages`. Row `i` holds the pages
+    linking to page `i`, which are indices[indptr[i]:indptr[i + 1]], and a
+    link from page `j` has weight 1 / out_degree[j]. Pages without links
+    are treated as linking to every page; that part of the matrix is dense,
+    so it is applied as a rank-one correction instead of being stored.
+    """
+
+    def __init__(self, pages, edges):
+        """
+        Build the matrix for a list of page names and an iterable of
+        `(source, target)` pairs of page numbers. Self-links and
+        duplicate links are ignored.
+        """
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        n = len(self.pages)
+
+        edges = set((source, target) for source, target in edges if source != target)
+
+        self.out_degree = array("l", [0]) * n
+        in_degree = array("l", [0]) * n
+        for source, target in edges:
+            self.out_degree[source] += 1
+            in_degree[target] += 1
+
+        # Row i starts at the sum of the in-degrees of all earlier rows
+        self.indptr = array("l", [0]) * (n + 1)
+        for i in range(n):
+            self.indptr[i + 1] = self.indptr[i] + in_degree[i]
+
+        # Outgoing links are stored the same way, for walking the graph
+        self.out_indptr = array("l", [0]) * (n + 1)
+        for i in range(n):
+            self.out_indptr[i + 1] = self.out_indptr[i] + self.out_degree[i]
+
+        position = self.indptr[:-1]
+        self.indices = array("l", [0]) * len(edges)
+        self.out_indices = array("l", [0]) * len(edges)
+        for k, (source, target) in enumerate(sorted(edges)):
+            self.indices[position[target]] = source
+            position[target] += 1
+            self.out_indices[k] = target
+
+        self.dangling = array("l", (i for i in range(n) if not self.out_degree[i]))
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the matrix for a corpus mapping pages to sets of linked pages.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        return cls(pages, (
+            (index[page], index[link])
+            for page in pages
+            for link in corpus[page]
+        ))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def multiply(self, ranks, damping_factor, rows=None):
+        """
+        Return the ranks after one step of the random surfer:
+        the damped product of the link matrix and `ranks`,
+        plus the random jumps from dangling pages and from damping.
+
+        If `rows` is given, only the ranks of those page numbers are
+        computed, and the others are copied from `ranks`.
+        """
+        n = len(self.pages)
+        indptr = self.indptr
+        indices = self.indices
+
+        # Rank that each page passes along each of its links
+        contributions = [
+            rank / degree if degree else 0
+            for rank, degree in zip(ranks, self.out_degree)
+        ]
+        dangling_rank = sum(ranks[i] for i in self.dangling)
+        base = (1 - damping_factor) / n + damping_factor * dangling_rank / n
+
+        get = contributions.__getitem__
+        if rows is None:
+            return [
+                base + damping_factor * sum(map(get, indices[indptr[i]:indptr[i + 1]]))
+                for i in range(n)
+            ]
+
+        new_ranks = list(ranks)
+        for i in rows:
+            new_ranks[i] = base + damping_factor * sum(map(get, indices[indptr[i]:indptr[i + 1]]))
+        return new_ranks
+
+    def sweep(self, ranks, damping_factor):
+        """
+        Return the ranks after one Gauss-Seidel sweep, which updates pages
+        in order and uses each updated rank right away, scaled to sum to 1.
+        """
+        n = len(self.pages)
+        indptr = self.indptr
+        indices = self.indices
+        inverse_degree = [1 / degree if degree else 0 for degree in self.out_degree]
+
+        ranks = list(ranks)
+        dangling_rank = sum(ranks[i] for i in self.dangling)
+        for i in range(n):
+            linked = sum(ranks[j] * inverse_degree[j] for j in indices[indptr[i]:indptr[i + 1]])
+            rank = (1 - damping_factor) / n + damping_factor * (dangling_rank / n + linked)
+            if not self.out_degree[i]:
+                dangling_rank += rank - ranks[i]
+            ranks[i] = rank
+
+        total = sum(ranks)
+        return [rank / total for rank in ranks]
+
+
+class EdgeFile:
+    """
+    Link graph stored in a binary file, for graphs whose links do not
+    fit in memory. It can be used in place of a `LinkMatrix` in
+    `power_iteration`, except with the "gauss_seidel" method, which needs
+    the links grouped by target. The "adaptive" method works but saves
+    nothing, as every multiplication reads all the links anyway.
+
+    The file, written by `write_edge_file`, holds a header, the links as
+    pairs of 64-bit page numbers sorted by source, and the out-degree of
+    every page. It is memory-mapped, and each multiplication streams
+    through the links in blocks of EDGE_BLOCK, so only vectors of one
+    number per page are kept in memory.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size < EDGE_FILE_HEADER.size:
+                raise ValueError(f"not an edge file: {filename}")
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.file.close()
+            raise
+
+        magic, self.n, self.m = EDGE_FILE_HEADER.unpack_from(self.map)
+        if magic != EDGE_FILE_MAGIC or size < EDGE_FILE_HEADER.size + 16 * self.m + 8 * self.n:
+            self.close()
+            raise ValueError(f"not an edge file: {filename}")
+
+        view = memoryview(self.map)[EDGE_FILE_HEADER.size:]
+        self.edges = view[:16 * self.m].cast("q")
+        self.out_degree = view[16 * self.m:16 * self.m + 8 * self.n].cast("q")
+
+    def __len__(self):
+        return self.n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Release the memory map and close the file.
+        """
+        for view in [getattr(self, "edges", None), getattr(self, "out_degree", None)]:
+            if view is not None:
+                view.release()
+        self.map.close()
+        self.file.close()
+
+    def multiply(self, ranks, damping_factor, rows=None):
+        """
+        Return the ranks after one step of the random surfer, as in
+        `LinkMatrix.multiply`, reading the links block by block.
+
+        If `rows` is given, the ranks of the other pages are copied from
+        `ranks`, but all links are still read, as they are sorted by source.
+        """
+        n = self.n
+        contributions = [
+            rank / degree if degree else 0
+            for rank, degree in zip(ranks, self.out_degree)
+        ]
+        dangling_rank = sum(
+            rank for rank, degree in zip(ranks, self.out_degree) if not degree
+        )
+        base = (1 - damping_factor) / n + damping_factor * dangling_rank / n
+
+        linked = [0] * n
+        for start in range(0, 2 * self.m, 2 * EDGE_BLOCK):
+            block = self.edges[start:start + 2 * EDGE_BLOCK]
+            for source, target in zip(block[0::2].tolist(), block[1::2].tolist()):
+                linked[target] += contributions[source]
+            block.release()
+
+        new_ranks = [base + damping_factor * rank for rank in linked]
+        if rows is None:
+            return new_ranks
+
+        # Keep the ranks of the pages that were not asked for
+        rows = set(rows)
+        return [new_ranks[i] if i in rows else ranks[i] for i in range(n)]
+
+
+def write_edge_file(filename, n, edges):
+    """
+    Write a binary edge file, to be read by `EdgeFile`, for `n` pages and
+    an iterable of `(source, target)` pairs of page numbers. Self-links and
+    duplicate links are dropped.
+
+    The links are sorted out of core: blocks of EDGE_BLOCK links are sorted
+    and written to temporary files, which are then merged.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        runs = []
+        block = []
+        for source, target in edges:
+            if source != target:
+                block.append((source, target))
+            if len(block) == EDGE_BLOCK:
+                runs.append(write_run(directory, len(runs), block))
+                block = []
+        if block:
+            runs.append(write_run(directory, len(runs), block))
+
+        out_degree = array("q", [0]) * n
+        m = 0
+        with open(filename + ".tmp", "wb") as f:
+            f.write(EDGE_FILE_HEADER.pack(EDGE_FILE_MAGIC, n, 0))
+
+            # Merge the sorted runs, skipping repeats of the same link
+            buffer = array("q")
+            previous = None
+            for edge in heapq.merge(*(read_run(run) for run in runs)):
+                if edge == previous:
+                    continue
+                previous = edge
+                buffer.extend(edge)
+                out_degree[edge[0]] += 1
+                m += 1
+                if len(buffer) >= 2 * EDGE_BLOCK:
+                    buffer.tofile(f)
+                    buffer = array("q")
+            buffer.tofile(f)
+            out_degree.tofile(f)
+
+            f.seek(0)
+            f.write(EDGE_FILE_HEADER.pack(EDGE_FILE_MAGIC, n, m))
+    os.replace(filename + ".tmp", filename)
+
+
+def write_run(directory, number, block):
+    """
+    Sort a block of links and write it to a temporary file in `directory`.
+    Return the name of the file.
+    """
+    run = os.path.join(directory, f"{number}.run")
+    with open(run, "wb") as f:
+        array("q", (page for edge in sorted(block) for page in edge)).tofile(f)
+    return run
+
+
+def read_run(run):
+    """
+    Yield the `(source, target)` pairs of a run written by `write_run`,
+    reading it in blocks.
+    """
+    with open(run, "rb") as f:
+        while True:
+            block = array("q", f.read(16 * EDGE_BLOCK))
+            if not block:
                 break
+            yield from zip(block[0::2], block[1::2])
+
 
-    return pagerank_i
+def power_iteration(matrix, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    ranks=None, method="power", history=None):
+    """
+    Return the list of PageRank values of the pages of a `LinkMatrix`
+    or `EdgeFile`, applying the matrix until the L1 norm of the change is below `tolerance`.
+
+    Iteration starts from the uniform distribution, or from the list of
+    `ranks` if given, which is normalized to sum to 1 first.
+
+    `method` selects how each iteration is done:
+        "power": multiply by the matrix (Jacobi iteration)
+        "gauss_seidel": use each new rank as soon as it is computed
+        "quadratic": power iteration, with quadratic extrapolation
+            applied every EXTRAPOLATION_PERIOD iterations
+        "adaptive": power iteration that stops recomputing pages
+            once their change is below tolerance / N, recomputing all
+            of them every EXTRAPOLATION_PERIOD iterations
+
+    If `history` is a list, the change in each iteration is appended to it,
+    so its length is the number of iterations done.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method: {method}")
+    if method == "gauss_seidel" and not hasattr(matrix, "sweep"):
+        raise ValueError("gauss_seidel needs the links grouped by target, as in a LinkMatrix")
+
+    n = len(matrix)
+    if ranks is None:
+        ranks = [1 / n] * n
+    else:
+        total = sum(ranks)
+        ranks = [rank / total for rank in ranks]
+
+    iterates = [ranks]
+    active = range(n)
+    for iteration in range(1, max_iterations + 1):
+        if method == "gauss_seidel":
+            new_ranks = matrix.sweep(ranks, damping_factor)
+        elif method == "adaptive":
+            # Recompute every page every few iterations, as frozen pages
+            # may start changing again when the pages linking to them do
+            full = iteration % EXTRAPOLATION_PERIOD == 0
+            new_ranks = matrix.multiply(ranks, damping_factor, None if full else active)
+            total = sum(new_ranks)
+            new_ranks = [rank / total for rank in new_ranks]
+        else:
+            new_ranks = matrix.multiply(ranks, damping_factor)
+
+        # Extrapolate from the last iterates every few iterations
+        if method == "quadratic":
+            iterates = iterates[-3:] + [new_ranks]
+            if iteration % EXTRAPOLATION_PERIOD == 0:
+                new_ranks = quadratic_extrapolation(iterates)
+                iterates = [new_ranks]
+
+        change = sum(abs(new - old) for new, old in zip(new_ranks, ranks))
+        if history is not None:
+            history.append(change)
+
+        # Freeze pages whose rank no longer changes, and only stop
+        # after an iteration that recomputed all of them
+        if method == "adaptive":
+            pages = range(n) if full else active
+            active = [i for i in pages if abs(new_ranks[i] - ranks[i]) > tolerance / n]
+            if not full:
+                ranks = new_ranks
+                continue
+
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks
+
+
+def quadratic_extrapolation(iterates):
+    """
+    Return the quadratic extrapolation of the last four iterates (Kamvar et
+    al., 2003), which removes the error components along the two eigenvectors
+    that decay the slowest, fitted by least squares. The result is scaled
+    to sum to 1, with negative ranks replaced by 0. The last iterate is
+    returned unchanged if the least squares problem is close to singular,
+    or if no rank is left positive.
+    """
+    if len(iterates) < 4:
+        return iterates[-1]
+
+    x0, x1, x2, x3 = iterates[-4:]
+    y1 = [a - b for a, b in zip(x1, x0)]
+    y2 = [a - b for a, b in zip(x2, x0)]
+    y3 = [a - b for a, b in zip(x3, x0)]
+
+    def dot(u, v):
+        return sum(a * b for a, b in zip(u, v))
+
+    # Solve the normal equations for gamma1, gamma2 minimizing
+    # |gamma1 * y1 + gamma2 * y2 + y3|, with gamma3 = 1
+    a11, a12, a22 = dot(y1, y1), dot(y1, y2), dot(y2, y2)
+    b1, b2 = -dot(y1, y3), -dot(y2, y3)
+    determinant = a11 * a22 - a12 * a12
+
+    # Nearly collinear y1 and y2, as when the error is left along a single
+    # eigenvector, give a determinant that is tiny relative to their norms
+    # but not 0, and gammas too large to be of any use
+    if determinant <= 1e-12 * a11 * a22:
+        return x3
+    gamma1 = (b1 * a22 - b2 * a12) / determinant
+    gamma2 = (a11 * b2 - a12 * b1) / determinant
+    gamma3 = 1
+
+    beta0 = gamma1 + gamma2 + gamma3
+    beta1 = gamma2 + gamma3
+    beta2 = gamma3
+    extrapolated = [
+        max(beta0 * a + beta1 * b + beta2 * c, 0)
+        for a, b, c in zip(x1, x2, x3)
+    ]
+
+    total = sum(extrapolated)
+    if total <= 0:
+        return x3
+    return [rank / total for rank in extrapolated]
 
 
 if __name__ == "__main__":
@@ -1,3 +1,16 @@
+import itertools
+import mmap
+import os
+import struct
+
+# Header of word list caches (magic, modification time and size of the
+# words file, number of word lengths), and entry for each word length
+# (length, number of words, offset of its words and letter bitsets)
+CACHE_HEADER = struct.Struct("=8sqqq")
+CACHE_BUCKET = struct.Struct("=qqq")
+CACHE_MAGIC = b"CWWORDS1"
+
+
 class Variable():
 
     ACROSS = "across"
@@ -37,7 +50,15 @@ class Variable():
 
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, cache_file=None):
+        """
+        Read the structure and the words of a crossword.
+
+        If `cache_file` is given, the words are read from it instead,
+        already split by length and indexed by letter position (see
+        `index_words`), as long as the words file has not changed since
+        the cache was written; otherwise the cache is written anew.
+        """
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -58,8 +79,19 @@ class Crossword():
                 self.structure.append(row)
 
         # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        self.buckets = None
+        if cache_file:
+            self.buckets = load_word_cache(words_file, cache_file)
+        if self.buckets is None:
+            with open(words_file) as f:
+                self.words = set(f.read().upper().splitlines())
+            if cache_file:
+                self.buckets = index_words(self.words)
+                save_word_cache(words_file, cache_file, self.buckets)
+        else:
+            self.words = set()
+            for words, _ in self.buckets.values():
+                self.words.update(words)
 
         # Determine variable set
         self.variables = set()
@@ -108,26 +140,160 @@ class Crossword():
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored, found through the variables
+        # covering each cell; other pairs map to None.
+        self.overlaps = Overlaps()
+        self.adjacency = {var: set() for var in self.variables}
+        cells = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                cells.setdefault(cell, []).append((var, k))
+        for covering in cells.values():
+            for (v1, k1), (v2, k2) in itertools.permutations(covering, 2):
+                self.overlaps[v1, v2] = (k1, k2)
+                self.adjacency[v1].add(v2)
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return set(self.adjacency[var])
+
+    def index_words(self):
+        """
+        Return the words split by length and indexed by letter position,
+        as returned by the function `index_words`.
+        """
+        if self.buckets is None:
+            self.buckets = index_words(self.words)
+        return self.buckets
+
+
+class Overlaps(dict):
+    """Overlaps of pairs of variables, which are None unless stored."""
+
+    def __missing__(self, key):
+        return None
+
+
+def index_words(words):
+    """
+    Split words by length. Return a dictionary mapping each length to a
+    sorted list of the words of that length, and a list with, for each
+    position, a dictionary mapping each letter to the bitset (as an int)
+    of the words with that letter at that position: bit i stands for
+    word i of the list.
+    """
+    buckets = dict()
+    for length in set(len(word) for word in words if word):
+        bucket = sorted(word for word in words if len(word) == length)
+        size = (len(bucket) + 7) // 8
+        masks = [dict() for _ in range(length)]
+        for i, word in enumerate(bucket):
+            for k, letter in enumerate(word):
+                if letter not in masks[k]:
+                    masks[k][letter] = bytearray(size)
+                masks[k][letter][i >> 3] |= 1 << (i & 7)
+        masks = [
+            {letter: int.from_bytes(mask, "little") for letter, mask in position.items()}
+            for position in masks
+        ]
+        buckets[length] = (bucket, masks)
+    return buckets
+
+
+def save_word_cache(words_file, cache_file, buckets):
+    """
+    Write words split by `index_words` to `cache_file`, along with the
+    modification time and size of `words_file`. Nothing is written if
+    some word is not ASCII, as words are stored with one byte per letter,
+    or if the cache file cannot be written.
+    """
+    stat = os.stat(words_file)
+    if not all(word.isascii() for words, _ in buckets.values() for word in words):
+        return
+
+    # Lay out the words of each length, followed by their letter bitsets
+    data = bytearray()
+    table = []
+    start = CACHE_HEADER.size + CACHE_BUCKET.size * len(buckets)
+    for length, (words, masks) in sorted(buckets.items()):
+        table.append(CACHE_BUCKET.pack(length, len(words), start + len(data)))
+        data += "".join(words).encode()
+        size = (len(words) + 7) // 8
+        for position in masks:
+            letters = sorted(position)
+            data += struct.pack("=q", len(letters))
+            data += "".join(letters).encode()
+            for letter in letters:
+                data += position[letter].to_bytes(size, "little")
+
+    # The cache only saves time, so a cache that cannot be written is skipped
+    try:
+        with open(cache_file + ".tmp", "wb") as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, stat.st_mtime_ns, stat.st_size, len(buckets)))
+            f.write(b"".join(table))
+            f.write(data)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError:
+        return
+
+
+def load_word_cache(words_file, cache_file):
+    """
+    Return the words split by length and letter position from `cache_file`,
+    read through a memory map, or None if there is no valid cache for the
+    current contents of `words_file`. A truncated or corrupt cache counts
+    as no cache, so that it is written anew.
+    """
+    stat = os.stat(words_file)
+    try:
+        f = open(cache_file, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        if os.fstat(f.fileno()).st_size < CACHE_HEADER.size:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(offset, size):
+        """
+        Return `size` bytes of the cache from `offset`, all of which
+        must lie within the cache.
+        """
+        if offset < 0 or size < 0 or offset + size > len(data):
+            raise ValueError("word cache is truncated")
+        return data[offset:offset + size]
+
+    with data:
+        magic, mtime, size, count = CACHE_HEADER.unpack_from(data)
+        if (magic, mtime, size) != (CACHE_MAGIC, stat.st_mtime_ns, stat.st_size):
+            return None
+
+        buckets = dict()
+        try:
+            for b in range(count):
+                length, n, offset = CACHE_BUCKET.unpack_from(
+                    data, CACHE_HEADER.size + b * CACHE_BUCKET.size
+                )
+                text = read(offset, n * length).decode()
+                words = [text[i:i + length] for i in range(0, n * length, length)]
+                offset += n * length
+
+                # Each position lists its letters, then holds one bitset per letter
+                size = (n + 7) // 8
+                masks = []
+                for _ in range(length):
+                    letters, = struct.unpack_from("=q", data, offset)
+                    offset += 8
+                    position = dict()
+                    for letter in read(offset, letters).decode():
+                        position[letter] = int.from_bytes(
+                            read(offset + letters, size), "little"
+                        )
+                        offset += size
+                    offset += letters
+                    masks.append(position)
+                buckets[length] = (words, masks)
+        except (struct.error, UnicodeDecodeError, ValueError):
+            return None
+    return buckets
@@ -1,21 +1,114 @@
+import bisect
 import sys
 import itertools
+import multiprocessing
 import random
+from collections import Counter, OrderedDict, deque
 from crossword import *
 
 
+# Inference made after each assignment in search, besides plain backtracking
+INFERENCES = ["forward", "mac"]
+
+# Heuristics for choosing the next variable to assign
+ORDERINGS = ["mrv", "dom/wdeg"]
+
+
+class Restart(Exception):
+    """
+    Raised to abandon a search that used up its allowance of failures.
+    """
+
+
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, inference=None, ordering="mrv", backjumping=False,
+                 max_nogoods=0, value_limit=None, seed=None, restarts=None):
         """
         Create new CSP crossword generate.
+
+        `inference` is None to solve by plain backtracking, or one of
+        INFERENCES to prune domains after each assignment by forward
+        checking or by maintaining arc consistency.
+
+        `ordering` is one of ORDERINGS: minimum remaining values, or domain
+        size over the weighted degree of constraints that caused failures.
+
+        With `backjumping`, search with forward checking jumps back over
+        assignments that did not cause a failure (conflict-directed
+        backjumping), and remembers up to `max_nogoods` combinations of
+        assignments found to have no solution.
+
+        If `value_limit` is given, only that many values of a variable are
+        ordered by the values they rule out, and the rest are tried after.
+
+        If `seed` is given, ties between variables and between values are
+        broken at random, with that seed. If `restarts` is given, search
+        starts over after `restarts` times the next term of the Luby
+        sequence (1, 1, 2, 1, 1, 2, 4, ...) failed values, keeping what
+        it learned (constraint weights and nogoods).
         """
+        if inference is not None and inference not in INFERENCES:
+            raise ValueError(f"unknown inference: {inference}")
+        if ordering not in ORDERINGS:
+            raise ValueError(f"unknown ordering: {ordering}")
+        if backjumping and inference != "forward":
+            raise ValueError("backjumping needs forward checking")
+        if restarts is not None and inference is None:
+            raise ValueError("restarts need inference")
+        self.inference = inference
+        self.ordering = ordering
+        self.backjumping = backjumping
+        self.max_nogoods = max_nogoods
+        self.value_limit = value_limit
+        self.random = random.Random(seed) if seed is not None else None
+        self.restarts = restarts
+        self.failures = 0
+        self.max_failures = None
         self.crossword = crossword
+
+        # Overlapping variables of each variable
+        self.neighbors = {
+            var: self.crossword.neighbors(var)
+            for var in self.crossword.variables
+        }
+
+        # Number of failures caused by each pair of variables, for dom/wdeg
+        self.weights = Counter()
+
+        # Recorded nogoods, least recently used first, and the nogoods
+        # containing each (variable, word) pair
+        self.nogoods = OrderedDict()
+        self.nogood_index = dict()
+
+        # Values removed from domains, in order, so that search can undo them,
+        # and for each assignment in backjumping, the variables it pruned
+        self.trail = []
+        self.reductions = []
+
+        self.init_domains()
+
+    def init_domains(self):
+        """
+        Set up `self.domains` with every word for every variable.
+        """
         self.domains = {
             var: self.crossword.words.copy()
             for var in self.crossword.variables
         }
 
+        # For each variable, map each position and letter to the words
+        # in its domain that have that letter at that position
+        self.letters = {
+            var: [dict() for _ in range(var.length)]
+            for var in self.crossword.variables
+        }
+        for var in self.crossword.variables:
+            for word in self.domains[var]:
+                if len(word) == var.length:
+                    for k, letter in enumerate(word):
+                        self.letters[var][k].setdefault(letter, set()).add(word)
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -92,7 +185,37 @@ class CrosswordCreator():
         """
         self.enforce_node_consistency()
         self.ac3()
-        return self.backtrack(dict())
+        if self.inference is None:
+            return self.backtrack(dict())
+        self.trail = []
+        if self.restarts is None:
+            return self.run_search()
+
+        for i in itertools.count(1):
+            self.failures = 0
+            self.max_failures = self.restarts * luby(i)
+            try:
+                return self.run_search()
+            except Restart:
+                self.undo(0)
+                self.reductions = []
+
+    def run_search(self):
+        """
+        Search for a complete assignment from the current domains.
+        """
+        if self.backjumping:
+            return self.backjump(dict())[0]
+        return self.search(dict())
+
+    def count_failure(self):
+        """
+        Count a failed value, and raise Restart if the search has used up
+        its allowance of failures.
+        """
+        self.failures += 1
+        if self.max_failures is not None and self.failures > self.max_failures:
+            raise Restart()
 
     def enforce_node_consistency(self):
         """
@@ -105,6 +228,30 @@ class CrosswordCreator():
                 if len(val) != var.length:
                     self.domains[var].remove(val)
 
+    def remove_value(self, var, word):
+        """
+        Remove `word` from the domain of `var`, keeping `self.letters`
+        up to date.
+        """
+        self.domains[var].remove(word)
+        for k, letter in enumerate(word):
+            words = self.letters[var][k][letter]
+            words.remove(word)
+            if not words:
+                del self.letters[var][k][letter]
+        self.trail.append((var, word))
+
+    def undo(self, mark):
+        """
+        Put back the values removed from domains since the trail
+        had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, word = self.trail.pop()
+            self.domains[var].add(word)
+            for k, letter in enumerate(word):
+                self.letters[var][k].setdefault(letter, set()).add(word)
+
     def overlap_indices(self, x, y):
         """
         Returns the overlap positions in variables x and y, respectively.
@@ -137,17 +284,15 @@ class CrosswordCreator():
 
         revision_made = False
 
-        for x_val in self.domains[x].copy():
-            consistent = False
-            for y_val in self.domains[y]:
-                if x_val[x_ind] == y_val[y_ind]:
-                    consistent = True
-                    break
-
-            # This code will only be executed if for some word in x's domain,
-            # there is no possible choice for y.
-            if not consistent:
-                self.domains[x].remove(x_val)
+        # Letters that some word in y's domain has at the overlap
+        supported = self.letters[y][y_ind]
+
+        for letter, x_vals in list(self.letters[x][x_ind].items()):
+
+            # Words in x's domain with this letter have no possible choice for y
+            if letter not in supported:
+                for x_val in list(x_vals):
+                    self.remove_value(x, x_val)
                 revision_made = True
 
         return revision_made
@@ -161,21 +306,30 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        if not arcs:
-            arcs = []
-            for var1 in self.crossword.variables:
-                for var2 in self.crossword.neighbors(var1):
-                    arcs.append((var1, var2))
-
-        while arcs:
+        if arcs is None:
+            arcs = [
+                (var1, var2)
+                for var1 in self.crossword.variables
+                for var2 in self.neighbors[var1]
+            ]
+
+        # Queue of arcs, and the set of arcs in it
+        queue = deque(arcs)
+        queued = set(queue)
+
+        while queue:
             # Take first arc in queue and enforce (one-directional) arc consistency
-            arc = arcs.pop(0)
-            if self.revise(arc[0], arc[1]):
-                if not self.domains[arc[0]]:
-                    return False
-                for var in self.crossword.neighbors(arc[0]):
-                    if (var, arc[0]) not in arcs:
-                        arcs.append((var, arc[0]))
+            x, y = queue.popleft()
+            queued.remove((x, y))
+            if self.revise(x, y):
+                if not self.domains[x]:
+                    return self.wipeout(x, y)
+
+                # Words removed from x had no match in y, so (y, x) needs no revision
+                for var in self.neighbors[x]:
+                    if var != y and (var, x) not in queued:
+                        queue.append((var, x))
+                        queued.add((var, x))
 
         return True
 
@@ -226,20 +380,51 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
+        values = self.values(var)
+
+        # Only rank the first `self.value_limit` values, if set
+        if self.value_limit is not None and len(values) > self.value_limit:
+            values, rest = values[:self.value_limit], values[self.value_limit:]
+        else:
+            rest = []
+
+        # For each unassigned neighbor, count its values with each letter
+        # at the overlap; a value of var rules out all the others
+        overlaps = []
+        for var2 in self.neighbors[var]:
+            if var2 not in assignment:
+                x_ind, y_ind = self.overlap_indices(var, var2)
+                overlaps.append((x_ind, self.domain_size(var2), self.letter_counts(var2, y_ind)))
+
         domain = []
-        for x_val in self.domains[var]:
+        for x_val in values:
             n_elim = 0
-            for var2 in self.crossword.neighbors(var):
-                if var2 not in assignment:
-                    x_ind, y_ind = self.overlap_indices(var, var2)
-                    x_letter = x_val[x_ind]
-                    for y_val in self.domains[var2]:
-                        if y_val[y_ind] != x_letter:
-                            n_elim += 1
-            domain += [(n_elim, x_val)]
+            for x_ind, size, counts in overlaps:
+                n_elim += size - counts.get(x_val[x_ind], 0)
+            tie = self.random.random() if self.random else 0
+            domain += [(n_elim, tie, x_val)]
 
         domain.sort()
-        return [tup[1] for tup in domain]
+        return [tup[2] for tup in domain] + rest
+
+    def values(self, var):
+        """
+        Return the list of words in the domain of `var`.
+        """
+        return list(self.domains[var])
+
+    def letter_counts(self, var, k):
+        """
+        Return a dictionary mapping each letter to the number of words in
+        the domain of `var` with that letter at position `k`.
+        """
+        return {letter: len(words) for letter, words in self.letters[var][k].items()}
+
+    def domain_size(self, var):
+        """
+        Return the number of values in the domain of `var`.
+        """
+        return len(self.domains[var])
 
     def select_unassigned_variable(self, assignment):
         """
@@ -252,10 +437,24 @@ class CrosswordCreator():
         unassigned = list(self.crossword.variables.difference(set(assignment.keys())))
 
         # Get list of candidates together with their number of remaining variables.
-        unassigned = [(len(self.domains[candidate]), candidate) for candidate in unassigned]
-
-        # Return candidate with smallest number of remaining variables
-        return min(unassigned, key=lambda tup: tup[0])[1]
+        unassigned = [(self.domain_size(candidate), candidate) for candidate in unassigned]
+
+        # Return candidate with smallest number of remaining variables,
+        # or with the smallest ratio of that number to its weighted degree
+        def score(tup):
+            size, candidate = tup
+            if self.ordering == "mrv":
+                return size
+            degree = sum(
+                1 + self.weights[frozenset((candidate, neighbor))]
+                for neighbor in self.neighbors[candidate]
+                if neighbor not in assignment
+            )
+            return size / degree if degree else float("inf")
+
+        if self.random:
+            return min(unassigned, key=lambda tup: (score(tup), self.random.random()))[1]
+        return min(unassigned, key=score)[1]
 
     def backtrack(self, assignment):
         """
@@ -286,22 +485,408 @@ class CrosswordCreator():
         else:
             return None
 
+    def search(self, assignment):
+        """
+        Using backtracking search with inference, extend the partial
+        `assignment` to a complete assignment and return it, or return
+        None if that is not possible.
+
+        The assignment is changed in place rather than copied, and domain
+        changes are undone through `self.trail` when a value fails.
+        Since inference removes the values of unassigned variables that
+        conflict with assigned ones, no assigned pairs need checking.
+        """
+        if len(assignment) == len(self.crossword.variables):
+            return dict(assignment)
+
+        var = self.select_unassigned_variable(assignment)
+        for word in self.order_domain_values(var, assignment):
+            mark = len(self.trail)
+            assignment[var] = word
+            if self.infer(var, word, assignment):
+                result = self.search(assignment)
+                if result is not None:
+                    return result
+            del assignment[var]
+            self.undo(mark)
+            self.count_failure()
+
+        return None
+
+    def infer(self, var, word, assignment):
+        """
+        Prune domains after assigning `word` to `var`: reduce the domain of
+        `var` to `word`, remove `word` from the domains of unassigned
+        variables, and then make unassigned neighbors of `var` consistent
+        with it, propagating further if maintaining arc consistency.
+
+        Return False if some domain ends up empty; return True otherwise.
+        """
+        for value in list(self.domains[var]):
+            if value != word:
+                self.remove_value(var, value)
+
+        # Each word is used only once
+        changed = [var]
+        for other in self.crossword.variables:
+            if other not in assignment and word in self.domains[other]:
+                self.remove_value(other, word)
+                if not self.domains[other]:
+                    return self.wipeout(other, var)
+                changed.append(other)
+
+        return self.propagate(changed, assignment)
+
+    def propagate(self, changed, assignment):
+        """
+        Revise the unassigned neighbors of the `changed` variables, and
+        continue with AC-3 if maintaining arc consistency.
+
+        Return False if some domain ends up empty; return True otherwise.
+        """
+        # Backjumping credits every removal to the assigned variable, the
+        # first one changed, so only arcs towards it are revised: revising
+        # against the others would depend on the assignments that shaped them
+        if self.backjumping:
+            changed = changed[:1]
+
+        arcs = [
+            (neighbor, changed_var)
+            for changed_var in changed
+            for neighbor in self.neighbors[changed_var]
+            if neighbor not in assignment
+        ]
+        if self.inference == "mac":
+            return self.ac3(arcs)
+
+        for x, y in arcs:
+            if self.revise(x, y) and not self.domains[x]:
+                return self.wipeout(x, y)
+        return True
+
+    def wipeout(self, x, y):
+        """
+        Note that revising `x` against `y` left the domain of `x` empty,
+        increasing the weight of their constraint, and return False.
+        """
+        self.weights[frozenset((x, y))] += 1
+        self.wiped = x
+        return False
+
+    def backjump(self, assignment):
+        """
+        Using backtracking search with forward checking and conflict-directed
+        backjumping, extend the partial `assignment` to a complete one.
+
+        Return a tuple of the complete assignment, or None if there is none,
+        and the conflict set: the assigned variables that ruled out every
+        value of the variables below. Callers whose variable is not in the
+        conflict set return right away, since trying their other values
+        cannot help.
+        """
+        if len(assignment) == len(self.crossword.variables):
+            return dict(assignment), set()
+
+        var = self.select_unassigned_variable(assignment)
+        conflict = set()
+        for word in self.order_domain_values(var, assignment):
+            mark = len(self.trail)
+            assignment[var] = word
+
+            nogood = self.find_nogood(assignment, var, word)
+            if nogood is not None:
+                conflict |= set(v for v, _ in nogood) - {var}
+            elif not self.infer(var, word, assignment):
+                conflict |= self.culprits(self.wiped) - {var}
+            else:
+                self.reductions.append(
+                    (var, set(entry[0] for entry in self.trail[mark:]))
+                )
+                result, child_conflict = self.backjump(assignment)
+                self.reductions.pop()
+                if result is not None:
+                    return result, set()
+                if var not in child_conflict:
+                    del assignment[var]
+                    self.undo(mark)
+                    return None, child_conflict
+                conflict |= child_conflict - {var}
+
+            del assignment[var]
+            self.undo(mark)
+            self.count_failure()
+
+        # Values of var were also ruled out by assignments that pruned its domain
+        conflict |= self.culprits(var)
+        self.record_nogood(assignment, conflict)
+        return None, conflict
+
+    def culprits(self, var):
+        """
+        Return the set of assigned variables whose forward checking
+        removed values from the domain of `var`.
+        """
+        return set(x for x, pruned in self.reductions if var in pruned)
+
+    def find_nogood(self, assignment, var, word):
+        """
+        Return a recorded nogood that `assignment`, which has just assigned
+        `word` to `var`, contains, or None if there is none.
+        """
+        for nogood in self.nogood_index.get((var, word), ()):
+            if all(assignment.get(v) == w for v, w in nogood):
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+    def record_nogood(self, assignment, conflict):
+        """
+        Remember that the assignments of the variables in `conflict` have
+        no solution, forgetting the least recently used nogood if more than
+        `self.max_nogoods` are recorded.
+        """
+        if not self.max_nogoods or not conflict:
+            return
+        nogood = frozenset((v, assignment[v]) for v in conflict)
+        if nogood in self.nogoods:
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.nogood_index.setdefault(pair, set()).add(nogood)
+
+        if len(self.nogoods) > self.max_nogoods:
+            oldest, _ = self.nogoods.popitem(last=False)
+            for pair in oldest:
+                self.nogood_index[pair].discard(oldest)
+                if not self.nogood_index[pair]:
+                    del self.nogood_index[pair]
+
+
+class BitsetCrosswordCreator(CrosswordCreator):
+    """
+    Crossword generator that stores each domain as an integer bitset.
+
+    Words are split by length into sorted lists, and bit i of the domain of
+    a variable stands for word i of the list for its length. For each
+    length, position and letter, a bitset marks the words with that letter
+    at that position, so revising an arc takes a few bitwise operations per
+    letter, and a domain needs one bit per word instead of a set of words.
+    """
+
+    def init_domains(self):
+        """
+        Set up the word lists and bitsets, and `self.domains` with
+        every word of the right length for every variable.
+        """
+        # Words of each length, and for each length, position and letter
+        # the bitset of words with that letter at that position
+        buckets = self.crossword.index_words()
+        self.words = dict()
+        self.masks = dict()
+        for length in set(var.length for var in self.crossword.variables):
+            words, masks = buckets.get(length, ([], [dict() for _ in range(length)]))
+            self.words[length] = words
+            self.masks[length] = masks
+
+        # Domains start with every word of the right length
+        self.domains = {
+            var: (1 << len(self.words[var.length])) - 1
+            for var in self.crossword.variables
+        }
+
+    def values(self, var):
+        """
+        Return the list of words in the domain of `var`.
+        """
+        words = self.words[var.length]
+        domain = self.domains[var]
+        values = []
+        while domain:
+            bit = domain & -domain
+            values.append(words[bit.bit_length() - 1])
+            domain ^= bit
+        return values
+
+    def domain_size(self, var):
+        """
+        Return the number of words in the domain of `var`.
+        """
+        return self.domains[var].bit_count()
+
+    def set_domain(self, var, domain):
+        """
+        Replace the domain of `var`, recording the old one on the trail.
+        """
+        if domain != self.domains[var]:
+            self.trail.append((var, self.domains[var]))
+            self.domains[var] = domain
+
+    def undo(self, mark):
+        """
+        Restore the domains replaced since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, domain = self.trail.pop()
+            self.domains[var] = domain
+
+    def enforce_node_consistency(self):
+        """
+        Domains only hold words of the right length from the start,
+        so they are node-consistent already.
+        """
+        pass
+
+    def revise(self, x, y):
+        """
+        Make `x` arc consistent with `y` using the letter bitsets.
+        """
+        x_ind, y_ind = self.overlap_indices(x, y)
+        if x_ind is None:
+            return False
+
+        # Words of x whose overlapping letter some word of y has
+        x_masks = self.masks[x.length][x_ind]
+        y_domain = self.domains[y]
+        supported = 0
+        for letter, y_mask in self.masks[y.length][y_ind].items():
+            if y_mask & y_domain:
+                supported |= x_masks.get(letter, 0)
+
+        domain = self.domains[x] & supported
+        if domain == self.domains[x]:
+            return False
+        self.set_domain(x, domain)
+        return True
+
+    def letter_counts(self, var, k):
+        """
+        Count the words in the domain of `var` by their letter at position `k`.
+        """
+        domain = self.domains[var]
+        return {
+            letter: (domain & mask).bit_count()
+            for letter, mask in self.masks[var.length][k].items()
+        }
+
+    def infer(self, var, word, assignment):
+        """
+        Reduce the domain of `var` to the bit of `word` and propagate it.
+        """
+        bit = 1 << bisect.bisect_left(self.words[var.length], word)
+        self.set_domain(var, bit)
+
+        # Each word is used only once
+        changed = [var]
+        for other in self.crossword.variables:
+            if other not in assignment and other != var and other.length == var.length:
+                if self.domains[other] & bit:
+                    self.set_domain(other, self.domains[other] & ~bit)
+                    if not self.domains[other]:
+                        return self.wipeout(other, var)
+                    changed.append(other)
+
+        return self.propagate(changed, assignment)
+
+
+def luby(i):
+    """
+    Return the `i`th term of the Luby sequence, counting from 1.
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def portfolio(size):
+    """
+    Return a list of `size` solver configurations, as pairs of a creator
+    class and its keyword arguments: deterministic MAC search first, then
+    alternating orderings and search methods with random tie-breaking
+    and restarts.
+    """
+    configurations = [(BitsetCrosswordCreator, dict(inference="mac"))]
+    variants = [
+        dict(inference="mac", ordering="dom/wdeg"),
+        dict(inference="forward", backjumping=True, max_nogoods=10000, ordering="dom/wdeg"),
+        dict(inference="mac"),
+        dict(inference="forward", backjumping=True, max_nogoods=10000)
+    ]
+    for seed in range(1, size):
+        options = dict(variants[(seed - 1) % len(variants)], seed=seed, restarts=100)
+        configurations.append((BitsetCrosswordCreator, options))
+    return configurations
+
+
+def solve_portfolio(crossword, configurations=None, processes=None):
+    """
+    Solve `crossword` with several solver configurations at once, one per
+    process, and return the first solution found, stopping the others.
+    A configuration that finds no solution does not stop the others:
+    None is only returned once every configuration has finished.
+    Raises RuntimeError if every configuration failed with an error.
+
+    `configurations` is a list of pairs of a creator class and its keyword
+    arguments, by default `portfolio` with one configuration per process.
+    """
+    if configurations is None:
+        configurations = portfolio(processes or multiprocessing.cpu_count())
+    tasks = [(crossword, creator, options) for creator, options in configurations]
+
+    errors = []
+    with multiprocessing.Pool(processes or len(tasks)) as pool:
+        for assignment, error in pool.imap_unordered(solve_configuration, tasks):
+            if assignment is not None:
+                return assignment
+            if error is not None:
+                errors.append(error)
+
+    if len(errors) == len(tasks):
+        raise RuntimeError("every solver configuration failed:\n" + "\n".join(errors))
+    return None
+
+
+def solve_configuration(task):
+    """
+    Solve a crossword with one configuration in a worker process.
+    Return a pair of the assignment and None, or of None and a description
+    of the error if the configuration failed, so that the other
+    configurations keep running.
+    """
+    crossword, creator, options = task
+    try:
+        return creator(crossword, **options).solve(), None
+    except Exception as error:
+        return None, f"{creator.__name__} {options}: {error!r}"
+
 
 def main():
 
+    # Optional flags: --portfolio solves with a portfolio of configurations,
+    # one per CPU, and --cache keeps the indexed words next to the words file
+    flags = {arg for arg in sys.argv[1:] if arg.startswith("--")}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+    if len(args) not in [2, 3] or not flags <= {"--portfolio", "--cache"}:
+        sys.exit("Usage: python generate.py [--portfolio] [--cache] structure words [output]")
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    structure = args[0]
+    words = args[1]
+    output = args[2] if len(args) == 3 else None
+    use_portfolio = "--portfolio" in flags
+    cache = words + ".cache" if "--cache" in flags else None
 
     # Generate crossword
-    crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    crossword = Crossword(structure, words, cache)
+    creator = BitsetCrosswordCreator(crossword, inference="mac")
+    if use_portfolio:
+        assignment = solve_portfolio(crossword)
+    else:
+        assignment = creator.solve()
 
     # Print result
     if assignment is None:
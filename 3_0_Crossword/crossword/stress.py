@@ -0,0 +1,117 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+
+from crossword import Crossword
+from generate import CrosswordCreator, BitsetCrosswordCreator
+
+# Solver configurations checked against plain backtracking
+CONFIGURATIONS = [
+    (CrosswordCreator, dict(inference="forward")),
+    (CrosswordCreator, dict(inference="mac")),
+    (CrosswordCreator, dict(inference="forward", backjumping=True)),
+    (CrosswordCreator, dict(inference="forward", backjumping=True, max_nogoods=50)),
+    (CrosswordCreator, dict(inference="forward", backjumping=True, max_nogoods=50,
+                            ordering="dom/wdeg", seed=1, restarts=2)),
+    (CrosswordCreator, dict(inference="mac", ordering="dom/wdeg", seed=2, restarts=2)),
+    (BitsetCrosswordCreator, dict(inference="mac")),
+    (BitsetCrosswordCreator, dict(inference="forward", backjumping=True, max_nogoods=50)),
+    (BitsetCrosswordCreator, dict(inference="forward", backjumping=True, max_nogoods=50,
+                                  ordering="dom/wdeg", seed=3, restarts=2))
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solve random small crosswords with every solver configuration "
+                    "and check that each agrees with plain backtracking."
+    )
+    parser.add_argument("-n", "--puzzles", type=int, default=500,
+                        help="number of random puzzles")
+    parser.add_argument("-w", "--words", type=int, default=37,
+                        help="number of random words per puzzle")
+    parser.add_argument("-l", "--letters", default="ABC",
+                        help="letters the random words are made of")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed from which each puzzle's seed is derived")
+    args = parser.parse_args()
+
+    failures = 0
+    solvable = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for puzzle in range(args.puzzles):
+            structure, words = generate_puzzle(f"{args.seed}-{puzzle}", args.words, args.letters)
+            structure_file = os.path.join(directory, "structure.txt")
+            words_file = os.path.join(directory, "words.txt")
+            with open(structure_file, "w") as f:
+                f.write("\n".join(structure) + "\n")
+            with open(words_file, "w") as f:
+                f.write("\n".join(words) + "\n")
+
+            expected = CrosswordCreator(Crossword(structure_file, words_file)).solve() is not None
+            solvable += expected
+            for creator, options in CONFIGURATIONS:
+                crossword = Crossword(structure_file, words_file)
+                assignment = creator(crossword, **options).solve()
+                if (assignment is not None) != expected or (
+                        assignment is not None and not valid(crossword, assignment)):
+                    failures += 1
+                    print(f"puzzle {puzzle}: {creator.__name__} {options} "
+                          f"{'found no' if assignment is None else 'returned a wrong'} solution")
+                    print("  structure:", structure)
+                    print("  words:", words)
+
+    print(f"{args.puzzles} puzzles, {solvable} solvable, {failures} failures")
+    if failures:
+        sys.exit(1)
+
+
+def generate_puzzle(seed, count, letters):
+    """
+    Return a random structure, as a list of rows, and a sorted list of
+    `count` random words made of `letters`, with lengths of the structure's
+    variables.
+    """
+    rng = random.Random(seed)
+    height, width = rng.randint(3, 5), rng.randint(3, 6)
+    structure = [
+        "".join("_" if rng.random() < 0.8 else "#" for _ in range(width))
+        for _ in range(height)
+    ]
+
+    # Lengths of the runs of open cells across and down
+    runs = [run for row in structure for run in row.split("#")]
+    runs += [run for column in zip(*structure) for run in "".join(column).split("#")]
+    lengths = [len(run) for run in runs if len(run) > 1] or [2]
+
+    words = set(
+        "".join(rng.choice(letters) for _ in range(rng.choice(lengths)))
+        for _ in range(count)
+    )
+    return structure, sorted(words)
+
+
+def valid(crossword, assignment):
+    """
+    Return True if `assignment` fills every variable of `crossword` with
+    distinct words of the right length that agree where they overlap.
+    """
+    if set(assignment) != crossword.variables:
+        return False
+    if len(set(assignment.values())) != len(assignment):
+        return False
+    for var, word in assignment.items():
+        if len(word) != var.length or word not in crossword.words:
+            return False
+    for v1, v2 in itertools.permutations(assignment, 2):
+        overlap = crossword.overlaps[v1, v2]
+        if overlap and assignment[v1][overlap[0]] != assignment[v2][overlap[1]]:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    main()